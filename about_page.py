@@ -1,4 +1,5 @@
 import streamlit as st
+from assets import image_variant, TEAM_PHOTO_WIDTH
 
 def show_about_page():
     # Page content
@@ -18,15 +19,15 @@ def show_about_page():
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        st.image("vidhi.jpg", use_column_width=True)
+        st.image(image_variant("vidhi.jpg", TEAM_PHOTO_WIDTH), use_column_width=True)
         st.markdown("**Vidhi Dhakate**", unsafe_allow_html=True)
     
     with col2:
-        st.image("tejas.jpg", use_column_width=True)
+        st.image(image_variant("tejas.jpg", TEAM_PHOTO_WIDTH), use_column_width=True)
         st.markdown("**Tejas Mahakalkar**", unsafe_allow_html=True)
 
     with col3:
-        st.image("kashish.jpg", use_column_width=True)
+        st.image(image_variant("kashish.jpg", TEAM_PHOTO_WIDTH), use_column_width=True)
         st.markdown("**Kashish Pawar**", unsafe_allow_html=True)
 
     # Future Work Section
@@ -48,4 +49,5 @@ def show_about_page():
     # Thank you line in italics and smaller font size
     st.markdown('<p style="font-size:18px; font-style:italic;">Thank you for supporting sustainable practices! Together, we can make a difference!</p>', unsafe_allow_html=True)
 
-show_about_page()
+if __name__ == "__main__":
+    show_about_page()
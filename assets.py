@@ -0,0 +1,133 @@
+import collections
+import io
+import os
+import threading
+import time
+
+from PIL import Image, features
+
+MAX_CACHE_BYTES = int(os.environ.get("ECOSORT_ASSET_CACHE_BYTES", str(32 * 2**20)))
+TEAM_PHOTOS = ("vidhi.jpg", "tejas.jpg", "kashish.jpg")
+TEAM_PHOTO_WIDTH = 320  # About page columns are about a third of the page width
+PREVIEW_MAX_SIDE = 640  # Upload previews never need more than this in the browser
+# WebP where Pillow supports it, progressive JPEG otherwise
+IMAGE_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+
+
+class BytesCache:
+    """
+    Process-wide LRU cache of static asset bytes, bounded by total size.
+    Entries are keyed by path and modification time, so edited files are re-read.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, load):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        data = load()
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries and len(data) <= self.max_bytes:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = BytesCache()
+
+
+# Function to read a static file once and serve later requests from memory
+def read_asset(path):
+    def load():
+        with open(path, 'rb') as file:
+            return file.read()
+    return _cache.get_or_load(('file', path, os.path.getmtime(path)), load)
+
+
+# Function to re-encode an image small: WebP, or progressive JPEG as a fallback
+def encode_image(img, max_side, image_format=None, quality=80):
+    image_format = image_format or IMAGE_FORMAT
+    img = img.copy() if max(img.size) > max_side else img
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    output = io.BytesIO()
+    if image_format == "WEBP":
+        img.save(output, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+# Function to get a resized, re-encoded variant of an image file, built once and cached
+def image_variant(path, max_side, image_format=None):
+    image_format = image_format or IMAGE_FORMAT
+
+    def build():
+        with Image.open(path) as img:
+            img.draft("RGB", (max_side, max_side))
+            return encode_image(img, max_side, image_format)
+    return _cache.get_or_load(('variant', path, os.path.getmtime(path), max_side, image_format), build)
+
+
+# Function to encode a decoded upload as a small preview for the browser
+def preview_bytes(img, max_side=PREVIEW_MAX_SIDE):
+    return encode_image(img, max_side)
+
+
+# Function to get the shared asset cache
+def get_asset_cache():
+    return _cache
+
+
+# Function to compare original and pipeline bytes and timings per page view
+def measure(runs=20):
+    from preprocessing import synthetic_jpeg, decode_image, DISPLAY_MAX_SIDE
+
+    original = sum(os.path.getsize(name) for name in TEAM_PHOTOS)
+    start = time.perf_counter()
+    for name in TEAM_PHOTOS:
+        image_variant(name, TEAM_PHOTO_WIDTH)  # What the first About page view builds
+    build_ms = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    for _ in range(runs):
+        variants = sum(len(image_variant(name, TEAM_PHOTO_WIDTH)) for name in TEAM_PHOTOS)
+    cached_ms = (time.perf_counter() - start) / runs * 1000.0
+    print(f"About page photos: {original / 1024:.1f} KiB -> {variants / 1024:.1f} KiB per view "
+          f"({IMAGE_FORMAT}, built once in {build_ms:.1f} ms, then {cached_ms:.3f} ms per view)")
+
+    upload = synthetic_jpeg(4000, 3000)
+    img = decode_image(upload, max_side=DISPLAY_MAX_SIDE)
+    start = time.perf_counter()
+    # Streamlit encodes a PIL image it is given; this is what used to be sent
+    before = io.BytesIO()
+    img.save(before, format="PNG")
+    before_ms = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    preview = preview_bytes(img)
+    after_ms = (time.perf_counter() - start) * 1000.0
+    print(f"12 MP upload preview: original upload {len(upload) / 1024:.0f} KiB, "
+          f"{DISPLAY_MAX_SIDE}px PNG {len(before.getvalue()) / 1024:.0f} KiB ({before_ms:.1f} ms) -> "
+          f"{PREVIEW_MAX_SIDE}px {IMAGE_FORMAT} {len(preview) / 1024:.0f} KiB ({after_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    measure()
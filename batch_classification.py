@@ -0,0 +1,140 @@
+import collections
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+
+from classification_page import classify_images, get_suggestions, record_result
+from model_holder import INPUT_SHAPE
+from preprocessing import to_model_input
+from upload_ingest import ingest_upload
+from assets import preview_bytes
+
+DEFAULT_BATCH_SIZE = 32
+THUMBNAIL_SIDE = 320  # Twice the displayed width, for high-DPI screens
+
+
+# Function to pick a decode pool size (PIL releases the GIL while decoding)
+def default_workers():
+    return min(8, (os.cpu_count() or 1) + 2)
+
+
+# Function to decode one uploaded file once into its model input and its thumbnail
+def _preprocess_file(uploaded_file):
+    uploaded_file.seek(0)
+    img = ingest_upload(uploaded_file)
+    return to_model_input(img)[0], preview_bytes(img, THUMBNAIL_SIDE)
+
+
+# Function to classify files in fixed-size batches, yielding results per batch
+def classify_in_batches(model, labels, files, batch_size=DEFAULT_BATCH_SIZE, max_workers=None):
+    """
+    Decode and preprocess the files in a thread pool and run them through the
+    model in fixed-size batches, one predict call per batch.
+    - Decoding runs at most two batches ahead of inference, so the next batch
+      is being prepared while the current one is in the model, without every
+      upload's model input sitting in memory at once.
+    - Yields a list of (index, predicted_label, error, thumbnail) tuples after
+      each batch; the thumbnail is encoded from the same decode.
+      Files that fail to decode are reported with an error and skipped.
+    """
+    lookahead = 2 * batch_size
+    with ThreadPoolExecutor(max_workers=max_workers or default_workers()) as pool:
+        remaining = iter(enumerate(files))
+        pending = collections.deque()
+
+        def refill():
+            while len(pending) < lookahead:
+                item = next(remaining, None)
+                if item is None:
+                    return
+                pending.append((item[0], pool.submit(_preprocess_file, item[1])))
+
+        refill()
+        while pending:
+            results = []
+            arrays, indices, thumbnails = [], [], []
+            for _ in range(min(batch_size, len(pending))):
+                index, future = pending.popleft()
+                try:
+                    array, thumbnail = future.result()
+                    arrays.append(array)
+                    indices.append(index)
+                    thumbnails.append(thumbnail)
+                except Exception as e:
+                    results.append((index, None, e, None))
+            refill()  # Start decoding the batch after next while this one is in the model
+            if arrays:
+                predicted = classify_images(model, labels, np.stack(arrays))
+                results.extend((index, label, None, thumbnail)
+                               for index, label, thumbnail in zip(indices, predicted, thumbnails))
+            results.sort(key=lambda result: result[0])
+            yield results
+
+
+# Function to measure images per second for several batch sizes
+def benchmark_batch_sizes(model, labels, batch_sizes=(1, 8, 32), n_images=64, repeats=3):
+    """
+    Time batched inference on synthetic preprocessed images.
+    Returns {batch_size: images_per_second}, the best of `repeats` runs.
+    """
+    rng = np.random.default_rng(0)
+    images = rng.uniform(-1.0, 1.0, size=(n_images,) + INPUT_SHAPE).astype(np.float32)
+    classify_images(model, labels, images[:max(batch_sizes)])  # Warm up every shape once
+    throughput = {}
+    for batch_size in batch_sizes:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for offset in range(0, n_images, batch_size):
+                classify_images(model, labels, images[offset:offset + batch_size])
+            best = min(best, time.perf_counter() - start)
+        throughput[batch_size] = n_images / best
+    return throughput
+
+
+# Function to show the multi-image upload and classification section
+def show_batch_upload_section(model, labels):
+    uploaded_files = st.file_uploader(
+        "Choose image files...", type=["jpg", "jpeg", "png"], accept_multiple_files=True
+    )
+    if not uploaded_files:
+        return
+
+    batch_size = st.select_slider("Batch size", options=[1, 8, 16, 32], value=DEFAULT_BATCH_SIZE)
+    if not st.button("Classify All", key="classifyAllButton", help="Click to classify every uploaded image"):
+        return
+
+    progress = st.progress(0.0)
+    done = 0
+    start = time.perf_counter()
+    for results in classify_in_batches(model, labels, uploaded_files, batch_size=batch_size):
+        for index, predicted_label, error, thumbnail in results:
+            uploaded_file = uploaded_files[index]
+            if error is not None:
+                st.error(f"{uploaded_file.name}: error during classification: {error}")
+                continue
+            record_result(uploaded_file, predicted_label)
+            with st.expander(f"{uploaded_file.name}: **{predicted_label}**"):
+                st.image(thumbnail, width=160)
+                for suggestion in get_suggestions(predicted_label):
+                    st.markdown(f'<div class="suggestion">{suggestion}</div>', unsafe_allow_html=True)
+        done += len(results)
+        progress.progress(done / len(uploaded_files))
+    elapsed = time.perf_counter() - start
+    st.success(f"Classified {done} images in {elapsed:.2f} s ({done / elapsed:.1f} images/s) 🎉")
+
+
+# Print images per second for batch sizes 1/8/32
+def main():
+    from model_holder import get_model_holder
+
+    model, labels = get_model_holder().get()
+    for batch_size, images_per_second in benchmark_batch_sizes(model, labels).items():
+        print(f"batch size {batch_size:>3}: {images_per_second:8.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
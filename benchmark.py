@@ -0,0 +1,194 @@
+import argparse
+import fnmatch
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from model_holder import INPUT_SHAPE
+from preprocessing import preprocess, synthetic_jpeg
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+IMAGE_SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+BUNDLED_IMAGES = ('kashish.jpg', 'tejas.jpg', 'vidhi.jpg')
+BATCH_SIZES = (1, 8, 32)
+
+# name -> (function, required modules); each function returns {case: [seconds, ...]}
+BENCHMARKS = {}
+
+
+# Decorator to register a benchmark and the modules it needs
+def benchmark(name, requires=()):
+    def register(function):
+        BENCHMARKS[name] = (function, requires)
+        return function
+    return register
+
+
+# Function to time `function` `runs` times after `warmup` untimed calls
+def time_calls(function, runs, warmup=1, clock=time.perf_counter):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(runs):
+        start = clock()
+        function()
+        timings.append(clock() - start)
+    return timings
+
+
+@benchmark('model_load', requires=('tensorflow',))
+def bench_model_load(runs):
+    # Cold: a fresh interpreter, including the TensorFlow import, up to a warmed model
+    script = ("import time; start = time.perf_counter()\n"
+              "from model_holder import ModelHolder; ModelHolder().get()\n"
+              "print(time.perf_counter() - start)\n")
+    cold = []
+    for _ in range(max(1, runs // 5)):
+        result = subprocess.run([sys.executable, '-c', script], cwd=HERE,
+                                capture_output=True, text=True, check=True)
+        cold.append(float(result.stdout.strip().splitlines()[-1]))
+
+    # Warm: the per-rerun cost of asking the shared holder for an already-loaded model
+    from model_holder import ModelHolder
+    holder = ModelHolder()
+    holder.get()
+    return {'model.cold_load': cold, 'model.warm_get': time_calls(holder.get, runs * 20)}
+
+
+@benchmark('preprocess', requires=('PIL',))
+def bench_preprocess(runs):
+    cases = {}
+    for width, height in IMAGE_SIZES:
+        image_bytes = synthetic_jpeg(width, height)
+        cases[f'preprocess.jpeg_{width}x{height}'] = time_calls(lambda: preprocess(image_bytes), runs)
+    for name in BUNDLED_IMAGES:
+        with open(os.path.join(HERE, name), 'rb') as file:
+            image_bytes = file.read()
+        cases[f'preprocess.bundled_{os.path.splitext(name)[0]}'] = time_calls(lambda: preprocess(image_bytes), runs)
+    return cases
+
+
+@benchmark('inference', requires=('tensorflow',))
+def bench_inference(runs):
+    from model_holder import get_model_holder
+
+    model, _ = get_model_holder().get()
+    images = np.random.default_rng(0).uniform(-1.0, 1.0, size=(max(BATCH_SIZES),) + INPUT_SHAPE).astype(np.float32)
+    cases = {}
+    for batch_size in BATCH_SIZES:
+        batch = images[:batch_size]
+        timings = time_calls(lambda: model.predict(batch, batch_size=batch_size, verbose=0), runs)
+        # Reported per image so batch sizes compare directly
+        cases[f'inference.batch_{batch_size}_per_image'] = [t / batch_size for t in timings]
+    return cases
+
+
+@benchmark('page', requires=('streamlit', 'tensorflow'))
+def bench_page(runs):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(HERE, 'app.py'), default_timeout=300)
+    app.run()
+    # Wall time and server CPU (all threads of this process) per full rerun
+    cases = {'page.home_rerun': time_calls(app.run, runs),
+             'page.home_rerun_cpu': time_calls(app.run, runs, clock=time.process_time)}
+    app.sidebar.radio[0].set_value('Classification').run()  # First visit loads the model
+    cases['page.classification_rerun'] = time_calls(app.run, runs)
+    cases['page.classification_rerun_cpu'] = time_calls(app.run, runs, clock=time.process_time)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return cases
+
+
+# Function to summarize raw timings into milliseconds
+def summarize(timings):
+    timings = np.array(timings) * 1000.0
+    return {'median_ms': float(np.median(timings)), 'p95_ms': float(np.percentile(timings, 95)), 'runs': len(timings)}
+
+
+# Function to run the selected benchmarks and return machine-readable results
+def run(pattern='*', runs=20):
+    results, skipped = {}, {}
+    for name, (function, requires) in BENCHMARKS.items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        missing = [module for module in requires if importlib.util.find_spec(module) is None]
+        if missing:
+            skipped[name] = f"missing: {', '.join(missing)}"
+            continue
+        for case, timings in function(runs).items():
+            results[case] = summarize(timings)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+# Function to compare results with a baseline; returns the regressed case names
+def compare(current, baseline, threshold):
+    regressions = []
+    for case, row in sorted(current['results'].items()):
+        before = baseline['results'].get(case)
+        if before is None:
+            print(f"{case:<40}{row['median_ms']:>10.2f} ms   (new)")
+            continue
+        change = row['median_ms'] / before['median_ms'] - 1.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(case)
+        print(f"{case:<40}{row['median_ms']:>10.2f} ms   {change:+7.1%} vs {before['median_ms']:.2f} ms"
+              f"{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the classification hot path and compare with a stored baseline.")
+    parser.add_argument('--only', default='*', help=f"Benchmarks to run (glob over: {', '.join(BENCHMARKS)})")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--output', help="Write the JSON results to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Fail when a median is this much slower than the baseline (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    current = run(args.only, args.runs)
+    for name, reason in current['skipped'].items():
+        print(f"skipped {name} ({reason})")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(current, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(current['results'], indent=2))
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import argparse
+import collections
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from model_holder import ModelHolder, MODEL_PATH, LABELS_PATH, MODEL_BACKEND, INPUT_SHAPE
+from preprocessing import decode_to_uint8, normalize_batch
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+FIELDS = ('path', 'label', 'confidence', 'error')
+
+
+# Function to walk a directory tree lazily, yielding image paths in a stable order
+def iter_image_paths(root):
+    with os.scandir(root) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_image_paths(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+
+# Function run in the worker processes: decode a batch of paths into one uint8 array
+def decode_batch(paths):
+    arrays, decoded, errors = [], [], []
+    for path in paths:
+        try:
+            arrays.append(decode_to_uint8(path))
+            decoded.append(path)
+        except Exception as e:
+            errors.append((path, str(e)))
+    batch = np.stack(arrays) if arrays else np.empty((0,) + INPUT_SHAPE, dtype=np.uint8)
+    return batch, decoded, errors
+
+
+class ResultWriter:
+    """
+    Appends results to a CSV or JSONL file (chosen by extension) and
+    remembers which paths an earlier, interrupted run already wrote.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.jsonl = output_path.endswith(('.jsonl', '.json'))
+        self._drop_partial_last_line()
+        self.done = self._read_done()
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self._file = open(output_path, 'a', newline='', encoding='utf-8')
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def _read_done(self):
+        if not os.path.exists(self.output_path):
+            return set()
+        with open(self.output_path, 'r', newline='', encoding='utf-8') as file:
+            if self.jsonl:
+                rows = []
+                for line in file:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # A run killed mid-write can leave one partial last line
+                        pass
+            else:
+                rows = csv.DictReader(file)
+            # A finished row has a label and confidence, or an error
+            return {row['path'] for row in rows
+                    if row.get('path') and ((row.get('label') and row.get('confidence') not in (None, '')) or row.get('error'))}
+
+    def _drop_partial_last_line(self):
+        # A run killed mid-write can leave a last line without its newline; cut it off
+        # so the image is classified again and the partial row does not stay in the file
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0:
+            return
+        with open(self.output_path, 'rb+') as file:
+            end = file.seek(0, os.SEEK_END)
+            file.seek(end - 1)
+            if file.read(1) == b'\n':
+                return
+            # Scan back from the end for the last complete line
+            position = end
+            while position > 0:
+                start = max(0, position - (1 << 16))
+                file.seek(start)
+                newline = file.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    file.truncate(start + newline + 1)
+                    return
+                position = start
+            file.truncate(0)
+
+    def write(self, rows):
+        for row in rows:
+            if self.jsonl:
+                self._file.write(json.dumps(row) + '\n')
+            else:
+                self._csv.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# Function to classify every image under a directory, writing results as it goes
+def run(input_dir, output_path, model_path=None, labels_path=LABELS_PATH, backend=MODEL_BACKEND,
+        batch_size=64, workers=None, prefetch=None):
+    writer = ResultWriter(output_path)
+    model, labels = ModelHolder(model_path, labels_path, backend).get()
+    workers = workers or os.cpu_count() or 1
+    prefetch = prefetch or workers * 2
+
+    paths = (path for path in iter_image_paths(input_dir) if path not in writer.done)
+    batches = iter(lambda: list(islice(paths, batch_size)), [])
+    processed, start = 0, time.perf_counter()
+    try:
+        # Spawned, not forked: forking a process whose TensorFlow threads are running can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # Keep `prefetch` batches decoding while the model works on the oldest one
+            pending = collections.deque(pool.submit(decode_batch, b) for b in islice(batches, prefetch))
+            while pending:
+                batch, decoded, errors = pending.popleft().result()
+                next_batch = next(batches, None)
+                if next_batch is not None:
+                    pending.append(pool.submit(decode_batch, next_batch))
+
+                rows = [{'path': path, 'label': '', 'confidence': '', 'error': error} for path, error in errors]
+                if len(batch):
+                    predictions = model.predict(normalize_batch(batch), batch_size=len(batch), verbose=0)
+                    for path, scores in zip(decoded, predictions):
+                        best = int(np.argmax(scores))
+                        rows.append({'path': path, 'label': labels[best],
+                                     'confidence': round(float(scores[best]), 4), 'error': ''})
+                writer.write(rows)
+
+                processed += len(rows)
+                elapsed = time.perf_counter() - start
+                print(f"\r{processed} images, {processed / elapsed:.1f} images/s", end='', file=sys.stderr)
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify every image under a directory and write the labels to CSV or JSONL. "
+                                                 "Re-running with the same output file resumes where it stopped.")
+    parser.add_argument('input_dir')
+    parser.add_argument('output', help="Results file (.csv, or .jsonl for JSON lines)")
+    parser.add_argument('--model', help=f"Model file (default: {MODEL_PATH}, or the converted file for TFLite backends)")
+    parser.add_argument('--labels', default=LABELS_PATH)
+    parser.add_argument('--backend', default=MODEL_BACKEND)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, help="Decode processes (default: CPU count)")
+    parser.add_argument('--prefetch', type=int, help="Batches decoded ahead of inference (default: 2 per worker)")
+    args = parser.parse_args()
+    run(args.input_dir, args.output, args.model, args.labels, args.backend,
+        args.batch_size, args.workers, args.prefetch)
+
+
+if __name__ == "__main__":
+    main()
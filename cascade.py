@@ -0,0 +1,160 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from model_holder import MODEL_PATH, INPUT_SHAPE
+
+SMALL_MODEL_PATH = os.environ.get('ECOSORT_CASCADE_SMALL_MODEL', 'waste_classification_small.h5')
+DEFAULT_THRESHOLD = float(os.environ.get('ECOSORT_CASCADE_THRESHOLD', '0.8'))
+
+
+# Function to turn model outputs into probabilities (softmax only if they are not already)
+def to_probabilities(predictions):
+    predictions = np.asarray(predictions, dtype=np.float32)
+    if predictions.min() >= 0.0 and np.allclose(predictions.sum(axis=1), 1.0, atol=1e-3):
+        return predictions
+    shifted = np.exp(predictions - predictions.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class CascadeModel:
+    """
+    Two-model cascade: a small, fast model answers first and only images whose
+    top probability is below `threshold` are escalated to the full model.
+    - predict() mirrors keras Model.predict and returns probabilities, so the
+      cascade can stand in for the full model anywhere in the app.
+    - Counts how many images were escalated.
+    """
+
+    def __init__(self, small_model, large_model, threshold=DEFAULT_THRESHOLD):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        probabilities = to_probabilities(self.small_model.predict(batch, batch_size=len(batch), verbose=0))
+        unsure = probabilities.max(axis=1) < self.threshold
+        if unsure.any():
+            escalated = batch[unsure]
+            probabilities[unsure] = to_probabilities(
+                self.large_model.predict(escalated, batch_size=len(escalated), verbose=0))
+        with self._lock:
+            self.images += len(batch)
+            self.escalated += int(unsure.sum())
+        return probabilities
+
+    def escalation_rate(self):
+        with self._lock:
+            return self.escalated / self.images if self.images else None
+
+    def get_weights(self):
+        return self.small_model.get_weights() + self.large_model.get_weights()
+
+
+# Function to load the small and full models as a cascade
+def load_cascade(model_path=MODEL_PATH, small_model_path=SMALL_MODEL_PATH, threshold=DEFAULT_THRESHOLD):
+    from saved_model_cache import load_compiled
+
+    small_model = load_compiled(small_model_path)
+    large_model = load_compiled(model_path)
+    return CascadeModel(small_model, large_model, threshold)
+
+
+# Function to distill a reduced-width MobileNetV2 from the full model on unlabeled images
+def derive_small_model(image_dir, output_path=SMALL_MODEL_PATH, alpha=0.35, epochs=5, batch_size=32):
+    """
+    Train a small student network to match the full model's probabilities
+    (knowledge distillation), so no labels are needed. Saved as .h5 so it
+    loads through load_model_func like the full model.
+    """
+    import tensorflow as tf
+    from classification_page import load_model_func
+    from preprocessing import preprocess
+    from tflite_backend import find_images
+
+    teacher = load_model_func(MODEL_PATH)
+    images = np.concatenate([preprocess(path) for path, _ in find_images(image_dir)])
+    targets = to_probabilities(teacher.predict(images, batch_size=batch_size, verbose=0))
+
+    backbone = tf.keras.applications.MobileNetV2(input_shape=INPUT_SHAPE, alpha=alpha,
+                                                 include_top=False, weights=None, pooling='avg')
+    outputs = tf.keras.layers.Dense(targets.shape[1], activation='softmax')(backbone.output)
+    student = tf.keras.Model(backbone.input, outputs)
+    student.compile(optimizer='adam', loss=tf.keras.losses.KLDivergence())
+    student.fit(images, targets, batch_size=batch_size, epochs=epochs, verbose=1)
+    student.save(output_path)
+    return student
+
+
+# Function to time single-image predictions (mean milliseconds)
+def mean_latency_ms(model, images):
+    model.predict(images[:1], verbose=0)
+    start = time.perf_counter()
+    for image in images:
+        model.predict(image[np.newaxis], verbose=0)
+    return (time.perf_counter() - start) / len(images) * 1000.0
+
+
+# Function to report escalation, latency and accuracy on a labeled folder
+def evaluate(image_dir, labels, thresholds=(0.5, 0.7, 0.8, 0.9)):
+    """
+    Images are read from <image_dir>/<label>/<image>. Returns one row for the
+    small model, one per cascade threshold and one for the full model.
+    """
+    from preprocessing import preprocess
+    from tflite_backend import find_images
+
+    samples = find_images(image_dir)
+    images = np.concatenate([preprocess(path) for path, _ in samples])
+    truth = np.array([labels.index(folder) if folder in labels else -1 for _, folder in samples])
+
+    cascade = load_cascade()
+    rows = []
+    for name, model in (('small only', cascade.small_model), ('full only', cascade.large_model)):
+        predicted = np.argmax(model.predict(images, verbose=0), axis=1)
+        rows.append({'mode': name, 'escalated': None,
+                     'latency_ms': mean_latency_ms(model, images),
+                     'accuracy': float(np.mean(predicted == truth))})
+    for threshold in thresholds:
+        model = CascadeModel(cascade.small_model, cascade.large_model, threshold)
+        latency = mean_latency_ms(model, images)
+        model.images = model.escalated = 0  # Count escalations on the scoring pass only
+        predicted = np.argmax(model.predict(images), axis=1)
+        rows.insert(-1, {'mode': f'cascade @ {threshold:.2f}', 'escalated': model.escalation_rate(),
+                         'latency_ms': latency, 'accuracy': float(np.mean(predicted == truth))})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate the two-model confidence cascade.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    derive_parser = commands.add_parser('derive', help="Distill the small model from the full one")
+    derive_parser.add_argument('image_dir', help="Unlabeled sample images")
+    derive_parser.add_argument('--alpha', type=float, default=0.35, help="MobileNetV2 width multiplier")
+    derive_parser.add_argument('--epochs', type=int, default=5)
+    evaluate_parser = commands.add_parser('evaluate', help="Report escalation, latency and accuracy")
+    evaluate_parser.add_argument('image_dir', help="Labeled samples laid out as <label>/<image>")
+    evaluate_parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5, 0.7, 0.8, 0.9])
+    args = parser.parse_args()
+
+    if args.command == 'derive':
+        derive_small_model(args.image_dir, alpha=args.alpha, epochs=args.epochs)
+        return
+
+    from classification_page import load_labels
+
+    for row in evaluate(args.image_dir, load_labels(), args.thresholds):
+        escalated = f"{row['escalated']:.0%}" if row['escalated'] is not None else "-"
+        print(f"{row['mode']:<16} escalated {escalated:>5}   latency {row['latency_ms']:7.2f} ms   "
+              f"accuracy {row['accuracy']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
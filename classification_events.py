@@ -0,0 +1,115 @@
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+
+EVENT_LOG_PATH = os.environ.get("ECOSORT_EVENT_LOG", "classification_events.jsonl")
+FLUSH_INTERVAL_SECONDS = 2.0
+FLUSH_BATCH_SIZE = 256
+
+
+class ClassificationEventLog:
+    """
+    Append-only log of classification events with running aggregates.
+    - record() updates per-user, per-label and per-user-label counts in O(1)
+      and queues the event; nothing is written on the request path.
+    - A background thread appends queued events to a JSONL file in batches,
+      every couple of seconds or sooner once a batch fills up.
+    - On start-up the existing file is replayed once to rebuild the counts.
+    """
+
+    def __init__(self, path=EVENT_LOG_PATH, flush_interval=FLUSH_INTERVAL_SECONDS, batch_size=FLUSH_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._wake = threading.Event()
+        self.total = 0
+        self.per_user = collections.Counter()
+        self.per_label = collections.Counter()
+        self.per_user_label = collections.defaultdict(collections.Counter)
+        self._replay()
+        self._thread = threading.Thread(target=self._flush_loop, name='classification-events', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _apply(self, user, label):
+        self.total += 1
+        self.per_user[user] += 1
+        self.per_label[label] += 1
+        self.per_user_label[user][label] += 1
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # A partial line from an interrupted write
+                self._apply(event['user'], event['label'])
+
+    def record(self, user, label):
+        with self._lock:
+            self._apply(user, label)
+            self._pending.append({'ts': time.time(), 'user': user, 'label': label})
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(''.join(json.dumps(event) + '\n' for event in pending))
+        except OSError:
+            # Keep the batch (in order) for the next attempt
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass  # Retried on the next tick; events stay counted in memory
+
+    def user_count(self, user):
+        with self._lock:
+            return self.per_user[user]
+
+    def user_label_counts(self, user):
+        with self._lock:
+            return dict(self.per_user_label.get(user, {}))
+
+    def label_counts(self):
+        with self._lock:
+            return dict(self.per_label)
+
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+
+# Function to get the process-wide classification event log
+def get_event_log():
+    global _event_log
+    if _event_log is None:
+        with _event_log_lock:
+            if _event_log is None:
+                _event_log = ClassificationEventLog()
+    return _event_log
+
+
+# Function to record that a user classified an item
+def record_classification(user, label):
+    get_event_log().record(user or 'anonymous', label)
@@ -1,29 +1,42 @@
 import streamlit as st
+import functools
 import os
 import numpy as np
-from PIL import Image
-from keras.models import load_model
-from keras.layers import DepthwiseConv2D
-from keras.preprocessing import image
-from keras.applications.mobilenet_v2 import preprocess_input
+from model_holder import get_model_holder, MODEL_PATH, LABELS_PATH
+from preprocessing import to_model_input, thread_buffer, DISPLAY_MAX_SIDE
+from diagnostics import stage
+from assets import preview_bytes
+from upload_ingest import ingest_upload, UploadRejected
+
+# Keras is imported inside the functions below, never at module level, so that
+# importing this page does not pull in TensorFlow before anything is classified.
+_custom_depthwise_conv2d = None
 
 # Custom DepthwiseConv2D class to handle loading without 'groups' argument
-class CustomDepthwiseConv2D(DepthwiseConv2D):
-    def __init__(self, *args, **kwargs):
-        kwargs.pop('groups', None)
-        super().__init__(*args, **kwargs)
+def get_custom_depthwise_conv2d():
+    global _custom_depthwise_conv2d
+    if _custom_depthwise_conv2d is None:
+        from keras.layers import DepthwiseConv2D
+
+        class CustomDepthwiseConv2D(DepthwiseConv2D):
+            def __init__(self, *args, **kwargs):
+                kwargs.pop('groups', None)
+                super().__init__(*args, **kwargs)
+
+        _custom_depthwise_conv2d = CustomDepthwiseConv2D
+    return _custom_depthwise_conv2d
 
 # Function to load the model
-def load_model_func():
-    model_path = 'waste_classification.h5'
+def load_model_func(model_path=MODEL_PATH):
+    from keras.models import load_model
+
     if not os.path.isfile(model_path):
         raise FileNotFoundError(f"Model file not found: {model_path}")
-    model = load_model(model_path, custom_objects={'DepthwiseConv2D': CustomDepthwiseConv2D})
+    model = load_model(model_path, custom_objects={'DepthwiseConv2D': get_custom_depthwise_conv2d()})
     return model
 
 # Load the labels from the labels file
-def load_labels():
-    labels_path = 'labels.txt'
+def load_labels(labels_path=LABELS_PATH):
     if not os.path.isfile(labels_path):
         raise FileNotFoundError(f"Labels file not found: {labels_path}")
     with open(labels_path, 'r') as file:
@@ -32,11 +45,7 @@ def load_labels():
 
 # Function to preprocess the uploaded image
 def preprocess_image(uploaded_file):
-    img = image.load_img(uploaded_file, target_size=(224, 224))
-    img_array = image.img_to_array(img)
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = preprocess_input(img_array)
-    return img_array
+    return to_model_input(ingest_upload(uploaded_file))
 
 # Function to classify an image
 def classify_image(model, labels, image_data):
@@ -44,161 +53,414 @@ def classify_image(model, labels, image_data):
     predicted_label = labels[np.argmax(predictions)]
     return predicted_label
 
+# Function to pick the k most likely labels with their probabilities
+def top_k_labels(labels, predictions, k=3):
+    from cascade import to_probabilities
+
+    probabilities = to_probabilities(predictions)[0]
+    best = np.argsort(probabilities)[::-1][:k]
+    return [[labels[i], float(probabilities[i])] for i in best]
+
+# Function to classify an image through the scheduler shared by all sessions
+def classify_image_scheduled(labels, image_data, k=3):
+    from inference_scheduler import get_scheduler
+
+    predictions = get_scheduler().predict(image_data)
+    return top_k_labels(labels, predictions, k)
+
+# Function to classify an uploaded or captured image, reusing cached predictions.
+# Returns the top-k [label, probability] pairs, most likely first.
+def classify_upload(labels, uploaded_file, cache_namespace='', img=None):
+    from prediction_cache import get_prediction_cache
+    from model_registry import get_model_registry
+
+    registry = get_model_registry()
+    if registry.ab_split:
+        # A/B test: each user sticks to one model, with its own labels and preprocessing.
+        # Both arms go through their model's micro-batching scheduler, as production traffic does.
+        name = registry.route(st.session_state.get('username') or upload_id(uploaded_file))
+        return classify_with_model(registry, name, uploaded_file, img)
+
+    cache = get_prediction_cache()
+    with stage('upload'):
+        image_bytes = uploaded_file.getvalue()
+    with stage('cache_lookup'):
+        top_k, phash = cache.get(image_bytes, cache_namespace)
+    if top_k is None:
+        # Reuse the image already decoded for display; this thread's buffer is
+        # free again once the scheduler has answered
+        if img is None:
+            img = ingest_upload(uploaded_file)
+        with stage('preprocess'):
+            image_data = to_model_input(img, out=thread_buffer())
+        with stage('predict'):
+            top_k = classify_image_scheduled(labels, image_data)
+        cache.put(image_bytes, top_k, cache_namespace, phash)
+    return top_k
+
+# Function to classify an upload with one registry model, reusing cached predictions
+def classify_with_model(registry, name, uploaded_file, img=None):
+    from prediction_cache import get_prediction_cache
+
+    cache = get_prediction_cache()
+    namespace = registry.cache_namespace(name)
+    with stage('upload'):
+        image_bytes = uploaded_file.getvalue()
+    with stage('cache_lookup'):
+        top_k, phash = cache.get(image_bytes, namespace)
+    if top_k is None:
+        top_k = registry.classify(img if img is not None else ingest_upload(uploaded_file), name)
+        cache.put(image_bytes, top_k, namespace, phash)
+    return top_k
+
+# Function to identify an uploaded file across reruns
+def upload_id(uploaded_file):
+    return getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+
+# Function to record a classification for gamification, once per uploaded file per session
+def record_result(uploaded_file, predicted_label):
+    from classification_events import record_classification
+
+    file_id = upload_id(uploaded_file)
+    recorded = st.session_state.setdefault('recorded_uploads', set())
+    if file_id in recorded:
+        return
+    recorded.add(file_id)
+    record_classification(st.session_state.get('username'), predicted_label)
+
+# Function to classify a batch of preprocessed images with one predict call
+def classify_images(model, labels, image_batch):
+    predictions = model.predict(image_batch, batch_size=len(image_batch), verbose=0)
+    return [labels[i] for i in np.argmax(predictions, axis=1)]
+
+# Recycling suggestions per label (built once at import, not on every rerun)
+SUGGESTIONS = {
+    "Plastic": [
+        "Recycle plastic containers by rinsing and placing them in recycling bins.",
+        "Consider using reusable bags instead of plastic ones.",
+        "Upcycle plastic bottles into planters or storage containers."
+    ],
+    "Metal": [
+        "Clean and recycle metal cans in your local recycling program.",
+        "Use metal containers for storage instead of plastic.",
+        "Donate old metal items instead of throwing them away."
+    ],
+    "Paper": [
+        "Recycle paper products like newspapers and cardboard.",
+        "Use both sides of paper before discarding.",
+        "Shred sensitive documents and recycle the scraps."
+    ],
+    "Glass": [
+        "Rinse glass jars and bottles before recycling them.",
+        "Consider using glass containers for food storage.",
+        "Repurpose glass jars as vases or decorative items."
+    ],
+    "Compost": [
+        "Compost kitchen scraps to create nutrient-rich soil.",
+        "Use compost bins or piles to reduce waste.",
+        "Educate others about the benefits of composting."
+    ],
+    "Cardboard": [
+        "Flatten cardboard boxes before recycling.",
+        "Reuse cardboard for crafts or storage.",
+        "Consider donating cardboard boxes to local schools or charities."
+    ]
+}
+
+CLASSIFICATION_CSS = """
+<style>
+body {
+    background-color: #F7FFF7; /* Light green for a refreshing look */
+    font-family: 'Helvetica', sans-serif;
+}
+.title {
+    text-align: center;
+    font-size: 3.5em;
+    color: #00A86B; /* Green shade for eco-friendliness */
+    font-weight: 700;
+    padding: 20px;
+    text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
+}
+.upload-section {
+    background: #ffffff;
+    padding: 25px;
+    border-radius: 15px;
+    box-shadow: 0 4px 10px rgba(0, 0, 0, 0.15);
+    margin: 20px 0;
+}
+.classify-button {
+    background-color: #228B22; /* Green color */
+    color: #ffffff;
+    padding: 12px 28px;
+    font-size: 1.2em;
+    border: none;
+    border-radius: 8px;
+    cursor: pointer;
+    transition: background-color 0.3s ease;
+}
+.classify-button:hover {
+    background-color: #32CD32; /* Bright green */
+}
+.suggestion {
+    margin-top: 15px;
+    padding: 15px;
+    background-color: #e7f9e7;
+    border-radius: 8px;
+    font-size: 1.1em;
+    color: #006400;
+    box-shadow: 0 4px 6px rgba(0, 128, 0, 0.15);
+}
+.footer-links a {
+    color: #228B22;
+    font-size: 1.1em;
+    text-decoration: none;
+    margin: 0 10px;
+}
+.footer-links a:hover {
+    text-decoration: underline;
+}
+</style>
+"""
+
 # Function to get recycling suggestions based on the predicted label
 def get_suggestions(predicted_label):
-    suggestions = {
-        "Plastic": [
-            "Recycle plastic containers by rinsing and placing them in recycling bins.",
-            "Consider using reusable bags instead of plastic ones.",
-            "Upcycle plastic bottles into planters or storage containers."
-        ],
-        "Metal": [
-            "Clean and recycle metal cans in your local recycling program.",
-            "Use metal containers for storage instead of plastic.",
-            "Donate old metal items instead of throwing them away."
-        ],
-        "Paper": [
-            "Recycle paper products like newspapers and cardboard.",
-            "Use both sides of paper before discarding.",
-            "Shred sensitive documents and recycle the scraps."
-        ],
-        "Glass": [
-            "Rinse glass jars and bottles before recycling them.",
-            "Consider using glass containers for food storage.",
-            "Repurpose glass jars as vases or decorative items."
-        ],
-        "Compost": [
-            "Compost kitchen scraps to create nutrient-rich soil.",
-            "Use compost bins or piles to reduce waste.",
-            "Educate others about the benefits of composting."
-        ],
-        "Cardboard": [
-            "Flatten cardboard boxes before recycling.",
-            "Reuse cardboard for crafts or storage.",
-            "Consider donating cardboard boxes to local schools or charities."
-        ]
-    }
-    return suggestions.get(predicted_label, ["No specific suggestions available."])
+    return SUGGESTIONS.get(predicted_label, ["No specific suggestions available."])
+
+# Function to build the suggestion cards for a label as one markdown block (cached per label)
+@functools.lru_cache(maxsize=None)
+def suggestion_cards_html(predicted_label):
+    return ''.join(f'<div class="suggestion">{suggestion}</div>' for suggestion in get_suggestions(predicted_label))
+
+# Function to show the most likely labels as probability bars
+def show_top_k(top_k):
+    for label, probability in top_k:
+        st.progress(probability, text=f"{label}: {probability:.0%}")
+
+# Function to render the recycling suggestion cards for a label
+def show_suggestions(predicted_label):
+    with stage('render_suggestions'):
+        st.subheader("Recycling Suggestions:")
+        st.markdown(suggestion_cards_html(predicted_label), unsafe_allow_html=True)
+
+# Decorator to run a section as a Streamlit fragment (falls back to a plain call on older Streamlit)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda function: function)
+
+# Function to decode an upload for display once per file, reusing it on later reruns
+def decoded_upload(uploaded_file, key):
+    file_id = upload_id(uploaded_file)
+    cached = st.session_state.get(f"decoded_{key}")
+    if cached is None or cached[0] != file_id:
+        img = ingest_upload(uploaded_file, max_side=DISPLAY_MAX_SIDE)
+        # The browser only gets a small re-encoded preview, built once per upload
+        cached = (file_id, img, preview_bytes(img))
+        st.session_state[f"decoded_{key}"] = cached
+    return cached[1]
+
+# Function to get the display preview of an upload decoded by decoded_upload
+def upload_preview(key):
+    return st.session_state[f"decoded_{key}"][2]
+
+# Function to get the stored result for this upload, if it was already classified
+def stored_result(uploaded_file, key):
+    file_id = upload_id(uploaded_file)
+    stored = st.session_state.get(f"result_{key}")
+    if stored is not None and stored[0] == file_id:
+        return stored[1]
+    return None
+
+# Function to classify an upload and keep the result so reruns do not repeat inference
+def classify_and_store(labels, uploaded_file, cache_namespace, img, key):
+    file_id = upload_id(uploaded_file)
+    top_k = classify_upload(labels, uploaded_file, cache_namespace, img)
+    record_result(uploaded_file, top_k[0][0])
+    st.session_state[f"result_{key}"] = (file_id, top_k)
+    return top_k
+
+# Function to show the webcam capture and its classification
+@fragment
+def show_webcam_section(labels, cache_namespace):
+    st.markdown("<div class='camera-section'>", unsafe_allow_html=True)
+    st.write("### Capture an Image Using Your Webcam")
+    camera_input = st.camera_input("Take a picture")
+    if camera_input is not None:
+        try:
+            img = decoded_upload(camera_input, "webcam")
+        except UploadRejected as e:
+            st.error(f"This image cannot be classified: {e}")
+            return
+        st.image(upload_preview("webcam"), caption='Captured Image', use_column_width=True)
+        if labels:
+            top_k = stored_result(camera_input, "webcam")
+            if top_k is None:
+                top_k = classify_and_store(labels, camera_input, cache_namespace, img, "webcam")
+            predicted_label = top_k[0][0]
+            st.write(f"### Result: **{predicted_label}**")
+            show_top_k(top_k)
+            show_suggestions(predicted_label)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# Function to show the multi-image upload section
+@fragment
+def show_batch_section(model, labels):
+    from batch_classification import show_batch_upload_section
+
+    show_batch_upload_section(model, labels)
+
+# Function to show continuous classification of a camera or video file
+@fragment
+def show_stream_section(labels):
+    from video_stream import show_stream_section as show_video_stream
+
+    show_video_stream(labels)
+
+# Function to find and classify every item in one photo
+@fragment
+def show_multi_object_section(labels):
+    from multi_object import show_multi_object_section as show_objects
+
+    show_objects(labels)
+
+# Function to show the single-image upload, classify button and result
+@fragment
+def show_upload_section(labels, cache_namespace):
+    uploaded_file = st.file_uploader("Choose an image file...", type=["jpg", "jpeg", "png"])
+
+    # Handle image upload and classification
+    if uploaded_file is None:
+        return
+    try:
+        img = decoded_upload(uploaded_file, "upload")
+    except UploadRejected as e:
+        st.error(f"This image cannot be classified: {e}")
+        return
+    st.markdown('<div class="upload-section">', unsafe_allow_html=True)
+    st.image(upload_preview("upload"), caption="Uploaded Image", use_column_width=True)
+    st.write("### Result:")
+
+    # Add a classify button with interactivity; a stored result is shown without re-running inference
+    top_k = stored_result(uploaded_file, "upload")
+    if st.button("Classify Waste", key="classifyButton", help="Click to classify the waste image"):
+        with st.spinner('Classifying... Please wait.'):
+            try:
+                top_k = classify_and_store(labels, uploaded_file, cache_namespace, img, "upload")
+            except Exception as e:
+                st.error(f"Error during classification: {e}")
+    if top_k is not None:
+        predicted_label = top_k[0][0]
+        st.success(f"Predicted label: **{predicted_label}** 🎉")
+        show_top_k(top_k)
+
+        # Show recycling suggestions
+        show_suggestions(predicted_label)
+    st.markdown('</div>', unsafe_allow_html=True)
 
 # Show classification page
 def show_classification_page():
-    # Load the model and labels
+    # Get the process-wide model and labels (loaded once, reused across reruns)
+    holder = get_model_holder()
     try:
-        model = load_model_func()
-        labels = load_labels()
+        with stage('model_get'):
+            model, labels = holder.get()
     except Exception as e:
         st.error(f"Error loading model or labels: {e}")
         return
+    model_info = holder.info()
+    # Cached predictions are only valid for the model that produced them
+    cache_namespace = f"{model_info['backend']}:{model_info['model_sha256']}:top-k"
 
-    # Set up the enhanced page style
-    st.markdown(
-        """
-        <style>
-        body {
-            background-color: #F7FFF7; /* Light green for a refreshing look */
-            font-family: 'Helvetica', sans-serif;
-        }
-        .title {
-            text-align: center;
-            font-size: 3.5em;
-            color: #00A86B; /* Green shade for eco-friendliness */
-            font-weight: 700;
-            padding: 20px;
-            text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-        }
-        .upload-section {
-            background: #ffffff;
-            padding: 25px;
-            border-radius: 15px;
-            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.15);
-            margin: 20px 0;
-        }
-        .classify-button {
-            background-color: #228B22; /* Green color */
-            color: #ffffff;
-            padding: 12px 28px;
-            font-size: 1.2em;
-            border: none;
-            border-radius: 8px;
-            cursor: pointer;
-            transition: background-color 0.3s ease;
-        }
-        .classify-button:hover {
-            background-color: #32CD32; /* Bright green */
-        }
-        .suggestion {
-            margin-top: 15px;
-            padding: 15px;
-            background-color: #e7f9e7;
-            border-radius: 8px;
-            font-size: 1.1em;
-            color: #006400;
-            box-shadow: 0 4px 6px rgba(0, 128, 0, 0.15);
-        }
-        .footer-links a {
-            color: #228B22;
-            font-size: 1.1em;
-            text-decoration: none;
-            margin: 0 10px;
-        }
-        .footer-links a:hover {
-            text-decoration: underline;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    # Set up the enhanced page style (built once at import, see CLASSIFICATION_CSS)
+    st.markdown(CLASSIFICATION_CSS, unsafe_allow_html=True)
 
     # Display enhanced title
     st.markdown('<div class="title">EcoSort 🌱</div>', unsafe_allow_html=True)
     st.write("### Capture or upload an image to classify waste type")
 
     # Webcam option
-    option = st.radio("Choose an option:", ("Upload Image", "Use Webcam"))
+    option = st.radio("Choose an option:", ("Upload Image", "Upload Multiple Images", "Use Webcam", "Live Stream",
+                                             "Several Items in One Photo"))
 
+    # Each section is a fragment: its widgets rerun only the section, not the whole app
     if option == "Use Webcam":
-        st.markdown("<div class='camera-section'>", unsafe_allow_html=True)
-        st.write("### Capture an Image Using Your Webcam")
-        camera_input = st.camera_input("Take a picture")
-        if camera_input is not None:
-            img = Image.open(camera_input)
-            st.image(img, caption='Captured Image', use_column_width=True)
-            image_data = preprocess_image(camera_input)
-            if model and labels:
-                predicted_label = classify_image(model, labels, image_data)
-                st.write(f"### Result: **{predicted_label}**")
-                suggestions = get_suggestions(predicted_label)
-                st.subheader("Recycling Suggestions:")
-                for suggestion in suggestions:
-                    st.markdown(f'<div class="suggestion">{suggestion}</div>', unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-
+        show_webcam_section(labels, cache_namespace)
+    elif option == "Upload Multiple Images":
+        show_batch_section(model, labels)
+    elif option == "Live Stream":
+        show_stream_section(labels)
+    elif option == "Several Items in One Photo":
+        show_multi_object_section(labels)
     else:  # Image upload option
-        uploaded_file = st.file_uploader("Choose an image file...", type=["jpg", "jpeg", "png"])
-
-        # Handle image upload and classification
-        if uploaded_file is not None:
-            st.markdown('<div class="upload-section">', unsafe_allow_html=True)
-            img = Image.open(uploaded_file)
-            st.image(img, caption="Uploaded Image", use_column_width=True)
-            st.write("### Result:")
-
-            # Add a classify button with interactivity
-            if st.button("Classify Waste", key="classifyButton", help="Click to classify the waste image"):
-                with st.spinner('Classifying... Please wait.'):
-                    try:
-                        image_data = preprocess_image(uploaded_file)
-                        predicted_label = classify_image(model, labels, image_data)
-                        st.success(f"Predicted label: **{predicted_label}** 🎉")
-                        
-                        # Show recycling suggestions
-                        suggestions = get_suggestions(predicted_label)
-                        st.subheader("Recycling Suggestions:")
-                        for suggestion in suggestions:
-                            st.markdown(f'<div class="suggestion">{suggestion}</div>', unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"Error during classification: {e}")
-            st.markdown('</div>', unsafe_allow_html=True)
+        show_upload_section(labels, cache_namespace)
+
+    show_model_info(model_info)
+    show_scheduler_info()
+    show_cache_info()
+    show_ab_test_info()
+
+
+# Function to show model load time and memory figures
+def show_model_info(info):
+    with st.expander("Model info"):
+        st.write(f"**Backend:** {info['backend']}")
+        st.write(f"**Loads in this process:** {info['loads']}")
+        if info['load_seconds'] is not None:
+            st.write(f"**Load time:** {info['load_seconds']:.2f} s")
+        if info['warmup_seconds'] is not None:
+            st.write(f"**Warm-up forward pass:** {info['warmup_seconds']:.2f} s")
+        if info['model_weight_bytes'] is not None:
+            st.write(f"**Model weights:** {info['model_weight_bytes'] / 2**20:.1f} MiB")
+        if info['rss_before_load'] is not None and info['rss_after_load'] is not None:
+            st.write(f"**Process memory:** {info['rss_before_load'] / 2**20:.0f} MiB before load, "
+                     f"{info['rss_after_load'] / 2**20:.0f} MiB after load")
+        if info['model_sha256']:
+            st.write(f"**Model SHA-256:** `{info['model_sha256'][:16]}`")
+        if info.get('escalation_rate') is not None:
+            st.write(f"**Escalated to the full model:** {info['escalation_rate']:.0%}")
+
+
+# Function to show the shared inference scheduler's queue and batching figures
+def show_scheduler_info():
+    from inference_scheduler import get_scheduler
+
+    stats = get_scheduler().stats()
+    with st.expander("Inference scheduler"):
+        st.write(f"**Queue depth:** {stats['queue_depth']}")
+        st.write(f"**Requests / batches:** {stats['requests']} / {stats['batches']}")
+        st.write(f"**Batch sizes:** {stats['batch_sizes'] or 'none yet'}")
+        if 'wait_ms_p50' in stats:
+            st.write(f"**Wait time:** p50 {stats['wait_ms_p50']:.1f} ms, "
+                     f"p95 {stats['wait_ms_p95']:.1f} ms, max {stats['wait_ms_max']:.1f} ms")
+
+
+# Function to compare the models of an A/B test (only shown while one is configured)
+def show_ab_test_info():
+    from model_registry import get_model_registry
+
+    stats = get_model_registry().stats()
+    if not stats['ab_split']:
+        return
+    with st.expander("A/B test"):
+        for name, share in stats['ab_split'].items():
+            row = stats['models'][name]
+            latency = (f"p50 {row['latency_ms_p50']:.1f} ms, p95 {row['latency_ms_p95']:.1f} ms"
+                       if 'latency_ms_p50' in row else "no timings yet")
+            st.write(f"**{name}** ({share:.0%} of users): {row['requests']} requests, {latency}")
+        st.write(f"**Resident models:** {', '.join(stats['resident']) or 'none'} "
+                 f"({stats['evictions']} evictions)")
+
+
+# Function to show the prediction cache's hit and miss counters
+def show_cache_info():
+    from prediction_cache import get_prediction_cache
+
+    stats = get_prediction_cache().stats()
+    with st.expander("Prediction cache"):
+        st.write(f"**Entries:** {stats['entries']}")
+        st.write(f"**Exact hits:** {stats.get('exact_hits', 0)}, "
+                 f"**near-duplicate hits:** {stats.get('near_duplicate_hits', 0)}, "
+                 f"**disk hits:** {stats.get('disk_hits', 0)}, **misses:** {stats.get('misses', 0)}")
+        st.write(f"**Evictions:** {stats.get('evictions', 0)}, **expired:** {stats.get('expired', 0)}")
+        if stats['hit_rate'] is not None:
+            st.write(f"**Hit rate:** {stats['hit_rate']:.0%}")
 
 
 # Main application
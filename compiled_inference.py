@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import numpy as np
+
+from model_holder import INPUT_SHAPE
+
+
+class CompiledModel:
+    """
+    Wraps a Keras model in a graph-compiled forward pass with a fixed
+    (None, 224, 224, 3) float32 input signature.
+    - The function is traced once, at warm-up, and reused for every batch size.
+    - predict() mirrors keras Model.predict without its per-call data adapter
+      and callback overhead.
+    - jit_compile=True additionally compiles the graph with XLA.
+    """
+
+    def __init__(self, model, jit_compile=False):
+        import tensorflow as tf
+
+        self.model = model
+        self.jit_compile = jit_compile
+        self._tf = tf
+        self._forward = tf.function(
+            lambda images: model(images, training=False),
+            input_signature=[tf.TensorSpec(shape=(None,) + INPUT_SHAPE, dtype=tf.float32)],
+            jit_compile=jit_compile,
+        )
+        # Trace now so the first real request does not pay for it
+        self._forward = self._forward.get_concrete_function()
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        images = self._tf.convert_to_tensor(np.asarray(batch, dtype=np.float32))
+        return self._forward(images).numpy()
+
+    def get_weights(self):
+        return self.model.get_weights()
+
+
+# Function to time single-image predictions and return p50/p99 in milliseconds
+def single_image_percentiles(model, runs=200, warmup=10):
+    image = np.random.default_rng(0).uniform(-1.0, 1.0, size=(1,) + INPUT_SHAPE).astype(np.float32)
+    for _ in range(warmup):
+        model.predict(image, verbose=0)
+    timings = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        model.predict(image, verbose=0)
+        timings[i] = time.perf_counter() - start
+    return float(np.percentile(timings, 50) * 1000.0), float(np.percentile(timings, 99) * 1000.0)
+
+
+# Print single-image latency for model.predict and the compiled paths
+def main():
+    from classification_page import load_model_func
+
+    parser = argparse.ArgumentParser(description="Compare single-image latency of model.predict and the compiled forward pass.")
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--no-xla', action='store_true', help="Skip the XLA-compiled variant")
+    args = parser.parse_args()
+
+    model = load_model_func()
+    variants = [('model.predict', model), ('compiled', CompiledModel(model))]
+    if not args.no_xla:
+        variants.append(('compiled + XLA', CompiledModel(model, jit_compile=True)))
+    for name, variant in variants:
+        p50, p99 = single_image_percentiles(variant, runs=args.runs)
+        print(f"{name:<16} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import bisect
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_holder import current_rss_bytes
+
+# Off by default; when off every hook below is a constant-time no-op
+ENABLED = os.environ.get("ECOSORT_DIAGNOSTICS", "0") == "1"
+DUMP_PATH = os.environ.get("ECOSORT_DIAGNOSTICS_FILE") or None
+DUMP_INTERVAL_SECONDS = 10.0
+METRICS_PORT = int(os.environ.get("ECOSORT_METRICS_PORT", "0"))
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class Histogram:
+    """
+    Cumulative-bucket timing histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return float('inf')
+
+
+_lock = threading.Lock()
+_histograms = collections.defaultdict(Histogram)
+_counters = collections.Counter()
+_peaks = {}
+_model_loads = collections.deque(maxlen=50)
+_started_at = time.time()
+_last_dump = 0.0
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+# Function to time a block of code as a named stage: `with stage('decode'): ...`
+def stage(name):
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+# Function to record a duration for a named stage
+def observe(name, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        _histograms[name].observe(seconds)
+
+
+# Function to increment a named counter
+def count(name, amount=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] += amount
+
+
+# Function to keep the largest value seen for a named gauge (e.g. bytes decoded per request)
+def record_peak(name, value):
+    if not ENABLED:
+        return
+    with _lock:
+        if value > _peaks.get(name, 0):
+            _peaks[name] = value
+
+
+# Function to record a model (re)load event
+def record_model_load(info):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters['model_loads'] += 1
+        _model_loads.append({key: info.get(key) for key in
+                             ('backend', 'load_seconds', 'warmup_seconds', 'rss_after_load', 'model_sha256', 'loaded_at')})
+
+
+# Function to make a quantile JSON-safe: beyond the last bucket it is unknown (null), not Infinity
+def _finite(value):
+    return None if value == float('inf') else value
+
+
+# Function to take a JSON-serializable snapshot of every metric
+def snapshot():
+    with _lock:
+        stages = {
+            name: {
+                'count': h.count,
+                'sum_seconds': h.sum,
+                'p50_seconds': _finite(h.quantile(0.5)),
+                'p95_seconds': _finite(h.quantile(0.95)),
+                'buckets': [[bound if bound != float('inf') else '+Inf', total] for bound, total in h.cumulative()],
+            }
+            for name, h in sorted(_histograms.items())
+        }
+        return {
+            'enabled': ENABLED,
+            'pid': os.getpid(),
+            'uptime_seconds': time.time() - _started_at,
+            'rss_bytes': current_rss_bytes(),
+            'counters': dict(_counters),
+            'peaks': dict(_peaks),
+            'stages': stages,
+            'model_loads': list(_model_loads),
+        }
+
+
+# Function to render every metric in the Prometheus text exposition format
+def prometheus_text():
+    data = snapshot()
+    lines = [
+        '# TYPE ecosort_process_resident_memory_bytes gauge',
+        f"ecosort_process_resident_memory_bytes {data['rss_bytes'] or 0}",
+        '# TYPE ecosort_uptime_seconds gauge',
+        f"ecosort_uptime_seconds {data['uptime_seconds']:.3f}",
+    ]
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'# TYPE ecosort_{name}_total counter')
+        lines.append(f'ecosort_{name}_total {value}')
+    for name, value in sorted(data['peaks'].items()):
+        lines.append(f'# TYPE ecosort_{name}_peak gauge')
+        lines.append(f'ecosort_{name}_peak {value}')
+    lines.append('# TYPE ecosort_stage_seconds histogram')
+    for name, stats in data['stages'].items():
+        for bound, total in stats['buckets']:
+            lines.append(f'ecosort_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {total}')
+        lines.append(f'ecosort_stage_seconds_sum{{stage="{name}"}} {stats["sum_seconds"]:.6f}')
+        lines.append(f'ecosort_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Function to write the JSON snapshot to ECOSORT_DIAGNOSTICS_FILE, at most every few seconds
+def maybe_dump(force=False):
+    global _last_dump
+    if not ENABLED or not DUMP_PATH:
+        return
+    now = time.monotonic()
+    if not force and now - _last_dump < DUMP_INTERVAL_SECONDS:
+        return
+    _last_dump = now
+    tmp_path = f"{DUMP_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(snapshot(), file, indent=2)
+    os.replace(tmp_path, DUMP_PATH)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = prometheus_text().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_BIND_FAILED = object()  # The port was taken; later calls do not try again
+_initialized = False
+
+
+# Function to serve /metrics and /metrics.json on ECOSORT_METRICS_PORT, once per process
+def start_metrics_server(port=METRICS_PORT):
+    global _server
+    if not ENABLED or not port:
+        return None
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+            except OSError as e:
+                # Another Streamlit process (or a stale one) already serves this port
+                print(f"Metrics server not started on port {port}: {e}", file=sys.stderr)
+                _server = _BIND_FAILED
+            else:
+                threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return None if _server is _BIND_FAILED else _server
+
+
+# Function to start the per-process diagnostics services; app.py calls it on every rerun, it runs once
+def init_process():
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    start_metrics_server()
@@ -0,0 +1,46 @@
+import streamlit as st
+import diagnostics
+
+# Show the diagnostics page (listed in the sidebar only when ECOSORT_DIAGNOSTICS=1)
+def show_diagnostics_page():
+    st.title("Diagnostics")
+    if not diagnostics.ENABLED:
+        st.info("Diagnostics are disabled. Start the app with ECOSORT_DIAGNOSTICS=1 to record them.")
+        return
+
+    data = diagnostics.snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Process memory", f"{(data['rss_bytes'] or 0) / 2**20:.0f} MiB")
+    col2.metric("Reruns", data['counters'].get('reruns', 0))
+    col3.metric("Model loads", data['counters'].get('model_loads', 0))
+
+    st.subheader("Stage timings")
+    if data['stages']:
+        st.table([
+            {
+                "stage": name,
+                "count": stats['count'],
+                "mean (ms)": round(stats['sum_seconds'] / stats['count'] * 1000.0, 2),
+                # None when the quantile is beyond the last bucket
+                "p50 ≤ (ms)": stats['p50_seconds'] and stats['p50_seconds'] * 1000.0,
+                "p95 ≤ (ms)": stats['p95_seconds'] and stats['p95_seconds'] * 1000.0,
+            }
+            for name, stats in data['stages'].items()
+        ])
+    else:
+        st.write("No stages recorded yet.")
+
+    st.subheader("Model load events")
+    if data['model_loads']:
+        st.table(data['model_loads'])
+    else:
+        st.write("No model loads recorded yet.")
+
+    st.subheader("Counters")
+    st.json(data['counters'])
+
+    with st.expander("Prometheus text"):
+        st.code(diagnostics.prometheus_text(), language="text")
+
+if __name__ == "__main__":
+    show_diagnostics_page()
@@ -1,6 +1,12 @@
 import streamlit as st
 import random
-import time
+from assets import read_asset
+from leaderboard_store import get_leaderboard_store, PAGE_SIZE
+from classification_events import get_event_log
+
+CLASSIFY_CHALLENGE = "Classify 5 items"
+CLASSIFY_TARGET = 5
+POINTS_PER_CLASSIFICATION = 2
 
 # Function to show the gamification page
 def show_gamification_page():
@@ -20,8 +26,10 @@ def show_gamification_page():
         }
     if 'milestones' not in st.session_state:
         st.session_state.milestones = []
-    if 'leaderboard' not in st.session_state:
-        st.session_state.leaderboard = {}
+    if 'leaderboard_page' not in st.session_state:
+        st.session_state.leaderboard_page = 0
+    if 'classifications_counted' not in st.session_state:
+        st.session_state.classifications_counted = 0
 
     # CSS for styling
     st.markdown("""
@@ -65,10 +73,16 @@ def show_gamification_page():
     # User profile input
     if st.session_state.username == '':
         st.session_state.username = st.text_input("Enter your username to start:", "")
+        # They are logged as 'anonymous', shared by every visitor, so they cannot be credited later
+        st.caption("Items classified before you enter a username do not count toward points or challenges.")
         if st.session_state.username:
             st.success(f"Welcome, {st.session_state.username}! Let's start earning points! 🎉")
     else:
         st.write(f"**User:** {st.session_state.username}")
+    load_user_progress()
+
+    # Award progress from classifications made on the Classification page
+    sync_classification_progress()
 
     # Display points and badges
     st.write(f"**Points:** {st.session_state.points}")
@@ -107,27 +121,49 @@ def display_badges():
     else:
         st.write("No badges earned yet.")
 
+# Function to award points, the classification challenge and milestones for new classifications.
+# Reads the running per-user count from the event log, so each rerun only handles the new events.
+def sync_classification_progress():
+    username = st.session_state.username
+    if not username:
+        return
+    count = get_event_log().user_count(username)
+    st.progress(min(count, CLASSIFY_TARGET) / CLASSIFY_TARGET,
+                text=f"Items classified: {count} (challenge: {CLASSIFY_TARGET})")
+    new = count - st.session_state.classifications_counted
+    if new <= 0:
+        return
+    st.session_state.classifications_counted = count
+    award_points(new * POINTS_PER_CLASSIFICATION)
+    st.info(f"+{new * POINTS_PER_CLASSIFICATION} points for {new} new classification(s)!")
+    if count >= CLASSIFY_TARGET and not st.session_state.challenges[CLASSIFY_CHALLENGE]:
+        complete_challenge(CLASSIFY_CHALLENGE)  # Also checks milestones
+    else:
+        check_milestone()
+
 # Function to complete a challenge
 def complete_challenge(challenge_type):
     if challenge_type in st.session_state.challenges:
         if st.session_state.challenges[challenge_type]:
             st.warning("You have already completed this challenge!")
             return
+        if challenge_type == CLASSIFY_CHALLENGE and st.session_state.classifications_counted < CLASSIFY_TARGET:
+            remaining = CLASSIFY_TARGET - st.session_state.classifications_counted
+            st.warning(f"Classify {remaining} more item(s) on the Classification page to complete this challenge!")
+            return
 
         challenge_points = random.randint(5, 25)  # Random points for variety
-        st.session_state.points += challenge_points
+        award_points(challenge_points)
         st.session_state.badges.append(f"{challenge_type} Completed! 🎖️")
         st.session_state.challenges[challenge_type] = True
         st.success(f"You earned {challenge_points} points for completing '{challenge_type}'! 🎉")
         show_animation(f"Congratulations on completing '{challenge_type}'!")
 
         check_milestone()
-        update_leaderboard()
 
-# Function to show a simple animation for completion
+# Function to show a simple animation for completion.
+# Every effect here runs in the browser; nothing waits on the script thread.
 def show_animation(message):
-    with st.spinner("Loading..."):
-        time.sleep(1)  # Simulate a loading time
     st.balloons()  # Streamlit built-in function for a fun effect
     st.success(message)
     play_sound_effect()  # Play a sound effect upon completion
@@ -136,7 +172,8 @@ def show_animation(message):
 def play_sound_effect():
     sound_file = "applause-cheer-236786.mp3"  # Replace with the path to your sound file
     try:
-        st.audio(sound_file)
+        # Read from disk once per process, then served from the shared asset cache
+        st.audio(read_asset(sound_file), format="audio/mpeg")
     except Exception as e:
         st.error(f"Error playing sound: {e}")
 
@@ -161,20 +198,55 @@ def check_milestone():
             st.session_state.milestones.append(milestone)
             st.success(f"Congratulations! You've reached {point} points!")
 
-# Function to display leaderboard
+# Function to display leaderboard (shared by all users, one page at a time)
 def display_leaderboard():
-    if st.session_state.leaderboard:
-        sorted_leaderboard = sorted(st.session_state.leaderboard.items(), key=lambda x: x[1], reverse=True)
-        st.write("### Top Players:")
-        for user, points in sorted_leaderboard:
-            st.markdown(f"- **{user}**: {points} points")
-    else:
+    store = get_leaderboard_store()
+    total = store.count()
+    if not total:
         st.write("No users on the leaderboard yet.")
+        return
+
+    pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    page = min(st.session_state.leaderboard_page, pages - 1)
+    st.write("### Top Players:")
+    for rank, user, points in store.top(page):
+        st.markdown(f"{rank}. **{user}**: {points} points")
 
-# Function to update the leaderboard
-def update_leaderboard():
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Previous", disabled=page == 0):
+        st.session_state.leaderboard_page = page - 1
+        st.rerun()
+    col2.write(f"Page {page + 1} of {pages}")
+    if col3.button("Next", disabled=page >= pages - 1):
+        st.session_state.leaderboard_page = page + 1
+        st.rerun()
+
+    if st.session_state.username:
+        position = store.rank(st.session_state.username)
+        if position is not None:
+            st.write(f"**Your rank:** #{position[0]} of {total} with {position[1]} points")
+
+# Function to load a user's saved points and classification count once a username is set.
+# Points earned before that are added to the saved total, never overwrite it.
+def load_user_progress():
     username = st.session_state.username
-    st.session_state.leaderboard[username] = st.session_state.points
+    if not username:
+        return
+    store = get_leaderboard_store()
+    if st.session_state.get('loaded_user') != username:
+        st.session_state.loaded_user = username
+        if st.session_state.points:
+            store.add_points(username, st.session_state.points)
+        # The event log count is the user's whole history, already credited in earlier sessions
+        st.session_state.classifications_counted = get_event_log().user_count(username)
+    # The store is the total: other sessions of the same user add to it too
+    st.session_state.points = store.points(username)
+
+# Function to add points to this session and the user's leaderboard total
+def award_points(points):
+    st.session_state.points += points
+    if st.session_state.username:
+        get_leaderboard_store().add_points(st.session_state.username, points)
 
 # Function to reset points and badges
 def reset_progress():
@@ -187,7 +259,10 @@ def reset_progress():
         "Share on Social Media": False
     }
     st.session_state.milestones = []
-    st.session_state.leaderboard = {}
+    if st.session_state.username:
+        get_leaderboard_store().remove(st.session_state.username)
+        # Classifications made so far stay counted and are not awarded again
+        st.session_state.classifications_counted = get_event_log().user_count(st.session_state.username)
     st.success("Your progress has been reset! 🎮")
 
 # Call the function to show the gamification page
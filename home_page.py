@@ -2,6 +2,19 @@ import streamlit as st
 
 # Add this CSS block to each page
 
+feature_list = [
+    ("Accurate Classification", "Utilizes state-of-the-art machine learning models to accurately classify various waste types."),
+    ("Instant Suggestions", "Receive instant suggestions on recycling, reusing, or disposing of waste responsibly."),
+    ("Easy to Use", "Simply upload an image, and the app intelligently categorizes your waste."),
+    ("Educational Resources", "Learn about waste management and how you can contribute to a sustainable future.")
+]
+
+# Feature cards, built once at import rather than on every rerun
+FEATURES_HTML = "".join(
+    f"<div class='feature' onclick=\"alert('Feature: {title}')\"><div class='feature-title'>{title}</div><p>{description}</p></div>"
+    for title, description in feature_list
+)
+
 def show_home_page():
     # Header
     st.markdown("<h1 class='header-title'>EcoSort 🌱</h1>", unsafe_allow_html=True)
@@ -14,15 +27,7 @@ def show_home_page():
     # Features Section
     st.subheader("Why Use This Application?")
     
-    feature_list = [
-        ("Accurate Classification", "Utilizes state-of-the-art machine learning models to accurately classify various waste types."),
-        ("Instant Suggestions", "Receive instant suggestions on recycling, reusing, or disposing of waste responsibly."),
-        ("Easy to Use", "Simply upload an image, and the app intelligently categorizes your waste."),
-        ("Educational Resources", "Learn about waste management and how you can contribute to a sustainable future.")
-    ]
-
-    for title, description in feature_list:
-        st.markdown(f"<div class='feature' onclick=\"alert('Feature: {title}')\"><div class='feature-title'>{title}</div><p>{description}</p></div>", unsafe_allow_html=True)
+    st.markdown(FEATURES_HTML, unsafe_allow_html=True)
 
   
     # Footer
@@ -0,0 +1,288 @@
+import argparse
+import base64
+import binascii
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from upload_ingest import MAX_UPLOAD_BYTES, UploadRejected, ingest_upload
+
+API_HOST = os.environ.get("ECOSORT_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("ECOSORT_API_PORT", "8600"))
+# Images admitted (queued or in the model) at once; beyond this requests get 429
+MAX_QUEUED_IMAGES = int(os.environ.get("ECOSORT_API_MAX_QUEUE", "64"))
+MAX_IMAGES_PER_REQUEST = 16
+REQUEST_TIMEOUT_SECONDS = 30.0
+KEEP_ALIVE_SECONDS = 30.0
+BUNDLED_IMAGES = ('kashish.jpg', 'tejas.jpg', 'vidhi.jpg')
+
+
+class Admission:
+    """
+    Bounded admission for the API: counts images waiting for or in inference.
+    Requests that would exceed the limit are refused at once instead of queueing.
+    """
+
+    def __init__(self, limit=MAX_QUEUED_IMAGES):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, images):
+        with self._lock:
+            if self.in_flight + images > self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += images
+            return True
+
+    def release(self, images):
+        with self._lock:
+            self.in_flight -= images
+
+
+# Function to classify decoded images in one scheduler request and attach suggestions
+def classify_decoded(images, k=3, on_queued=None):
+    """
+    `on_queued` is called with the scheduler's Future once the images are
+    queued; it completes when they leave the model, even after a timeout here.
+    """
+    from classification_page import top_k_labels, get_suggestions
+    from inference_scheduler import get_scheduler
+    from model_holder import get_model_holder
+    from preprocessing import to_model_input
+
+    _, labels = get_model_holder().get()
+    batch = np.concatenate([to_model_input(img) for img in images])
+    # One submit per request; the scheduler batches it with concurrent requests
+    future = get_scheduler().submit(batch)
+    if on_queued is not None:
+        on_queued(future)
+    predictions = future.result(timeout=REQUEST_TIMEOUT_SECONDS)
+    results = []
+    for row in range(len(images)):
+        top_k = top_k_labels(labels, predictions[row:row + 1], k)
+        results.append({'label': top_k[0][0], 'confidence': top_k[0][1], 'top_k': top_k,
+                        'suggestions': get_suggestions(top_k[0][0])})
+    return results
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive: clients reuse one connection
+    timeout = KEEP_ALIVE_SECONDS   # Idle connections are closed after this
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+    def _reply(self, status, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        from model_holder import get_model_holder
+        from inference_scheduler import get_scheduler
+
+        if self.path == '/healthz':
+            self._reply(200, {'status': 'ok'})
+        elif self.path == '/readyz':
+            holder = get_model_holder()
+            info = holder.info()
+            ready = holder.is_loaded() and info['warmup_seconds'] is not None
+            self._reply(200 if ready else 503, {
+                'ready': ready,
+                'backend': info['backend'],
+                'load_seconds': info['load_seconds'],
+                'warmup_seconds': info['warmup_seconds'],
+                'queued_images': self.server.admission.in_flight,
+                'max_queued_images': self.server.admission.limit,
+                'rejected_requests': self.server.admission.rejected,
+                'scheduler': get_scheduler().stats() if ready else None,
+            })
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def _content_length(self):
+        # None after replying: a body without a valid length cannot be read or skipped
+        raw = self.headers.get('Content-Length')
+        if raw is None or 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            self.close_connection = True
+            self._reply(411, {'error': 'Content-Length is required'})
+            return None
+        try:
+            length = int(raw)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            self._reply(400, {'error': f"invalid Content-Length: {raw!r}"})
+            return None
+        return length
+
+    def do_POST(self):
+        length = self._content_length()
+        if length is None:
+            return
+        if self.path not in ('/v1/classify', '/v1/classify/batch'):
+            self.close_connection = True  # The body is not read, so the connection cannot be reused
+            self._reply(404, {'error': 'not found'})
+            return
+        if length > MAX_UPLOAD_BYTES * (MAX_IMAGES_PER_REQUEST if self.path.endswith('batch') else 1):
+            self.close_connection = True  # The body is not read, so the connection cannot be reused
+            self._reply(413, {'error': 'request body too large'})
+            return
+        body = self.rfile.read(length)
+
+        from model_holder import get_model_holder
+        if not get_model_holder().is_loaded():
+            self._reply(503, {'error': 'model is still loading'}, [('Retry-After', '5')])
+            return
+        try:
+            if self.path == '/v1/classify':
+                encoded = [body]  # The raw image is the request body
+            else:
+                encoded = [base64.b64decode(item, validate=True) for item in json.loads(body)['images']]
+                if not 0 < len(encoded) <= MAX_IMAGES_PER_REQUEST:
+                    raise ValueError(f"send between 1 and {MAX_IMAGES_PER_REQUEST} images")
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            self._reply(400, {'error': f"bad request: {e}"})
+            return
+
+        admission, count = self.server.admission, len(encoded)
+        if not admission.try_acquire(count):
+            self._reply(429, {'error': 'inference queue is full'}, [('Retry-After', '1')])
+            return
+        queued = []
+
+        def hand_off(future):
+            # Once queued, the images hold their slots until the scheduler is done with them
+            queued.append(future)
+            future.add_done_callback(lambda _: admission.release(count))
+
+        try:
+            try:
+                images = [ingest_upload(data) for data in encoded]
+            except UploadRejected as e:
+                self._reply(422, {'error': str(e)})
+                return
+            except (OSError, Image.DecompressionBombError) as e:
+                # A truncated or corrupt image can pass the header check and fail while decoding
+                self._reply(422, {'error': f"image could not be decoded: {e}"})
+                return
+            del encoded, body  # Only the model-sized images are kept while waiting
+            results = classify_decoded(images, on_queued=hand_off)
+        except FutureTimeout:
+            self._reply(504, {'error': 'inference timed out'})
+            return
+        except Exception as e:
+            self._reply(500, {'error': f"inference failed: {type(e).__name__}: {e}"})
+            return
+        finally:
+            if not queued:
+                admission.release(count)
+        self._reply(200, results[0] if self.path == '/v1/classify' else {'results': results})
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to create the API server; the model warms up in the background
+def create_server(host=API_HOST, port=API_PORT, max_queued_images=MAX_QUEUED_IMAGES):
+    from model_holder import start_background_warm_up
+
+    server = ThreadingHTTPServer((host, port), _ApiHandler)
+    server.daemon_threads = True
+    server.admission = Admission(max_queued_images)
+    start_background_warm_up()
+    return server
+
+
+# Function to run keep-alive clients against the API and report latency and 429s
+def load_test(host=API_HOST, port=API_PORT, clients=16, seconds=10.0, images_per_request=1):
+    payloads = []
+    for name in BUNDLED_IMAGES:
+        with open(name, 'rb') as file:
+            payloads.append(file.read())
+    if images_per_request == 1:
+        path, bodies = '/v1/classify', payloads
+    else:
+        path = '/v1/classify/batch'
+        bodies = [json.dumps({'images': [base64.b64encode(payloads[(i + j) % len(payloads)]).decode()
+                                         for j in range(images_per_request)]}).encode()
+                  for i in range(len(payloads))]
+
+    latencies, statuses, lock = [], {}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection(host, port, timeout=REQUEST_TIMEOUT_SECONDS)
+        sent = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            connection.request('POST', path, body=bodies[(index + sent) % len(bodies)],
+                               headers={'Content-Type': 'application/octet-stream'})
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            sent += 1
+            with lock:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if response.status == 200:
+                    latencies.append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ok = statuses.get(200, 0)
+    print(f"{clients} clients, {images_per_request} image(s)/request, {elapsed:.1f} s: "
+          f"{ok / elapsed:.1f} requests/s ({ok * images_per_request / elapsed:.1f} images/s), statuses {statuses}")
+    if latencies:
+        latencies = np.array(latencies) * 1000.0
+        print(f"latency p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+              f"p99 {np.percentile(latencies, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP inference API for smart-bin clients.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    serve = subcommands.add_parser('serve', help="Serve /v1/classify, /v1/classify/batch, /healthz and /readyz")
+    serve.add_argument('--host', default=API_HOST)
+    serve.add_argument('--port', type=int, default=API_PORT)
+    serve.add_argument('--max-queue', type=int, default=MAX_QUEUED_IMAGES, help="Images admitted before 429")
+    load = subcommands.add_parser('loadgen', help="Load-test a running API with the bundled images")
+    load.add_argument('--host', default=API_HOST)
+    load.add_argument('--port', type=int, default=API_PORT)
+    load.add_argument('--clients', type=int, default=16)
+    load.add_argument('--seconds', type=float, default=10.0)
+    load.add_argument('--images-per-request', type=int, default=1)
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = create_server(args.host, args.port, args.max_queue)
+        print(f"EcoSort API on http://{args.host}:{args.port}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        load_test(args.host, args.port, args.clients, args.seconds, args.images_per_request)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("ECOSORT_MAX_BATCH_SIZE", "16"))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get("ECOSORT_MAX_WAIT_MS", "5"))
+
+
+# Function to run a batch through the process-wide model
+def _predict_with_shared_model(batch):
+    from model_holder import get_model_holder
+
+    model, _ = get_model_holder().get()
+    return model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class _Request:
+    __slots__ = ('images', 'future', 'enqueued_at')
+
+    def __init__(self, images):
+        self.images = images
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """
+    Collects inference requests from every session into one queue and runs
+    them through the model in micro-batches.
+    - A batch is sent as soon as it holds max_batch_size images or the oldest
+      request has waited max_wait_ms, whichever comes first.
+    - Each caller gets back the prediction rows for its own images.
+    - Queue depth, batch sizes and per-request wait times are recorded.
+    """
+
+    def __init__(self, predict_fn=_predict_with_shared_model,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 wait_samples=1000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._pending = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = collections.Counter()
+        self._wait_seconds = collections.deque(maxlen=wait_samples)
+        self._requests = 0
+        self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, images):
+        """
+        Queue a (n, 224, 224, 3) array and return a Future for its predictions.
+        """
+        request = _Request(np.asarray(images, dtype=np.float32))
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, images, timeout=None):
+        return self.submit(images).result(timeout=timeout)
+
+    def _next_request(self, timeout=None):
+        if self._pending is not None:
+            request, self._pending = self._pending, None
+            return request
+        return self._queue.get(timeout=timeout)
+
+    def _collect_batch(self):
+        first = self._next_request()
+        batch = [first]
+        size = len(first.images)
+        deadline = first.enqueued_at + self.max_wait
+        while size < self.max_batch_size:
+            # Past the deadline, still take requests that are already queued
+            remaining = max(0.0, deadline - time.perf_counter())
+            try:
+                request = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(request.images) > self.max_batch_size:
+                # Keep the request whole; it starts the next batch
+                self._pending = request
+                break
+            batch.append(request)
+            size += len(request.images)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            try:
+                images = np.concatenate([request.images for request in batch])
+                predictions = self.predict_fn(images)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            self._record(batch, len(images), started)
+            offset = 0
+            for request in batch:
+                count = len(request.images)
+                request.future.set_result(predictions[offset:offset + count])
+                offset += count
+
+    def _record(self, batch, batch_size, started):
+        with self._stats_lock:
+            self._batch_sizes[batch_size] += 1
+            self._requests += len(batch)
+            self._wait_seconds.extend(started - request.enqueued_at for request in batch)
+
+    def stats(self):
+        """
+        Return queue depth, batch-size distribution and wait-time percentiles.
+        """
+        with self._stats_lock:
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            waits = np.array(self._wait_seconds) if self._wait_seconds else None
+            requests = self._requests
+        stats = {
+            'queue_depth': self._queue.qsize() + (self._pending is not None),
+            'requests': requests,
+            'batches': sum(batch_sizes.values()),
+            'batch_sizes': batch_sizes,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+        if waits is not None:
+            stats['wait_ms_p50'] = float(np.percentile(waits, 50) * 1000.0)
+            stats['wait_ms_p95'] = float(np.percentile(waits, 95) * 1000.0)
+            stats['wait_ms_max'] = float(waits.max() * 1000.0)
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Function to get the process-wide scheduler shared by all sessions
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler()
+    return _scheduler
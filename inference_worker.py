@@ -0,0 +1,364 @@
+import argparse
+import atexit
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from model_holder import INPUT_SHAPE, current_rss_bytes
+
+SOCKET_PATH = os.environ.get("ECOSORT_WORKER_SOCKET", "/tmp/ecosort-inference.sock")
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("ECOSORT_WORKER_TIMEOUT", "30"))
+# Clients wait longer than the worker's own timeout, so a slow batch is answered (or failed) by the worker
+CLIENT_TIMEOUT_SECONDS = REQUEST_TIMEOUT_SECONDS + 10.0
+# How long clients keep reconnecting while `supervise` restarts the worker and it reloads the model
+RECONNECT_SECONDS = float(os.environ.get("ECOSORT_WORKER_RECONNECT", "30"))
+# Connections (each with a shared-memory segment) one app process keeps open to the worker
+MAX_CONNECTIONS = int(os.environ.get("ECOSORT_WORKER_CONNECTIONS", "4"))
+# Images per client shared-memory segment; larger batches are sent in chunks
+SEGMENT_IMAGES = 32
+RESTART_BACKOFF_SECONDS = (0.5, 1.0, 2.0, 5.0)
+_HEADER = struct.Struct('>I')
+
+
+class WorkerUnavailable(RuntimeError):
+    """
+    Raised when the inference worker cannot be reached or does not answer in time.
+    """
+
+
+# Function to send one length-prefixed JSON message
+def _send(sock, message):
+    body = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+# Function to receive one length-prefixed JSON message
+def _recv(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+def _attach(name):
+    segment = shared_memory.SharedMemory(name=name)
+    # The client owns the segment; stop this process's tracker from unlinking it on exit
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+class _WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        segments = {}  # name -> (segment, float32 view) for this client connection
+        try:
+            while True:
+                try:
+                    message = _recv(self.request)
+                except ConnectionError:
+                    return
+                try:
+                    _send(self.request, self.server.dispatch(message, segments))
+                except Exception as e:
+                    _send(self.request, {'ok': False, 'error': f"{type(e).__name__}: {e}"})
+        finally:
+            for segment, _ in segments.values():
+                segment.close()
+
+
+class InferenceWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Holds the one model for every app process on this machine.
+    - Clients put preprocessed tensors in shared memory and send only the
+      segment name and image count over the Unix socket.
+    - Requests from all connections go through one InferenceScheduler, so
+      concurrent app processes are batched together.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        from inference_scheduler import InferenceScheduler
+        from model_holder import get_model_holder
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # Left behind by a worker that was killed
+        self.holder = get_model_holder()
+        if self.holder.backend == 'remote':
+            raise ValueError("the inference worker needs a local backend, not ECOSORT_BACKEND=remote")
+        self.holder.get()  # Load and warm before accepting connections
+        self.scheduler = InferenceScheduler()
+        self.started_at = time.time()
+        super().__init__(socket_path, _WorkerHandler)
+
+    def dispatch(self, message, segments):
+        op = message.get('op')
+        if op == 'predict':
+            name = message['shm']
+            if name not in segments:
+                segment = _attach(name)
+                segments[name] = (segment, np.ndarray((SEGMENT_IMAGES,) + INPUT_SHAPE, np.float32, segment.buf))
+            images = segments[name][1][:message['count']]
+            predictions = self.scheduler.predict(images, timeout=REQUEST_TIMEOUT_SECONDS)
+            return {'ok': True, 'predictions': np.asarray(predictions).tolist()}
+        if op == 'info':
+            _, labels = self.holder.get()
+            info = self.holder.info()
+            return {'ok': True, 'labels': labels, 'pid': os.getpid(), 'rss': current_rss_bytes(),
+                    'backend': info['backend'], 'model_weight_bytes': info['model_weight_bytes'],
+                    'uptime_seconds': time.time() - self.started_at, 'scheduler': self.scheduler.stats()}
+        if op == 'ping':
+            return {'ok': True}
+        raise ValueError(f"unknown op: {op}")
+
+
+# Function to run the worker in this process until it is killed
+def serve(socket_path=SOCKET_PATH):
+    with InferenceWorkerServer(socket_path) as server:
+        print(f"inference worker {os.getpid()} listening on {socket_path}", flush=True)
+        server.serve_forever()
+
+
+# Function to keep a worker process running, restarting it with backoff when it exits
+def supervise(socket_path=SOCKET_PATH):
+    failures = 0
+    while True:
+        started = time.monotonic()
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--socket', socket_path])
+        try:
+            code = process.wait()
+        except KeyboardInterrupt:
+            process.terminate()
+            process.wait()
+            return
+        # A worker that ran for a while resets the backoff
+        failures = 0 if time.monotonic() - started > 60 else failures + 1
+        delay = RESTART_BACKOFF_SECONDS[min(failures, len(RESTART_BACKOFF_SECONDS) - 1)]
+        print(f"inference worker exited with {code}; restarting in {delay:.1f} s", flush=True)
+        time.sleep(delay)
+
+
+class _Channel:
+    """
+    One connection to the worker with its own shared-memory segment.
+    """
+
+    def __init__(self, socket_path, timeout):
+        self.segment = shared_memory.SharedMemory(create=True, size=SEGMENT_IMAGES * int(np.prod(INPUT_SHAPE)) * 4)
+        self.view = np.ndarray((SEGMENT_IMAGES,) + INPUT_SHAPE, np.float32, self.segment.buf)
+        self.sock = None
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(socket_path)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        # The worker may still be reading the segment; its mapping outlives the unlink
+        self.view = None
+        self.segment.unlink()
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # A caller's array view still points at it; freed with the view
+
+
+class RemoteModel:
+    """
+    Thin client for the inference worker with the model's predict() interface,
+    used by ModelHolder when ECOSORT_BACKEND=remote.
+    - Requests check out one of at most `max_connections` channels (a socket
+      plus a shared-memory segment) and return it afterwards, so any number
+      of threads (Streamlit runs each rerun on a new one) share a fixed set;
+      only the segment name and counts cross the socket.
+    - A request that fails because the worker is down or restarting is
+      retried on fresh connections for up to `reconnect_seconds` (longer than
+      the supervisor's backoff plus a model load). A request the worker does
+      not answer within `timeout` is not retried. Either way the error is
+      WorkerUnavailable.
+    - `labels` come from the worker, so they always match its model's outputs.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT_SECONDS, reconnect_seconds=RECONNECT_SECONDS,
+                 max_connections=MAX_CONNECTIONS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.reconnect_seconds = reconnect_seconds
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._closed = False
+        atexit.register(self.close)
+        self._info = self._request({'op': 'info'})
+        self.labels = list(self._info['labels'])
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise WorkerUnavailable(f"no free connection to the inference worker after {self.timeout:.0f} s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return _Channel(self.socket_path, self.timeout)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, channel, broken=False):
+        if broken or self._closed:
+            channel.close()
+        else:
+            self._idle.put(channel)
+        self._slots.release()
+
+    def _request(self, message, images=None):
+        deadline = time.monotonic() + self.reconnect_seconds
+        delay = 0.1
+        while True:
+            channel = None
+            try:
+                channel = self._checkout()
+                if images is not None:
+                    channel.view[:len(images)] = images
+                    request = dict(message, shm=channel.segment.name, count=len(images))
+                else:
+                    request = message
+                _send(channel.sock, request)
+                reply = _recv(channel.sock)
+            except (OSError, ConnectionError) as e:
+                if channel is not None:
+                    self._checkin(channel, broken=True)
+                # A timeout means the worker is up but overloaded; retrying would only add load
+                if isinstance(e, socket.timeout) or time.monotonic() + delay > deadline:
+                    raise WorkerUnavailable(f"inference worker at {self.socket_path}: {e}") from e
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+                continue
+            self._checkin(channel)
+            if not reply.get('ok'):
+                raise RuntimeError(f"inference worker error: {reply.get('error')}")
+            return reply
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        for start in range(0, len(batch), SEGMENT_IMAGES):
+            reply = self._request({'op': 'predict'}, batch[start:start + SEGMENT_IMAGES])
+            outputs.append(np.asarray(reply['predictions'], dtype=np.float32))
+        return np.concatenate(outputs)
+
+    def info(self):
+        return self._request({'op': 'info'})
+
+    def model_bytes(self):
+        return self._info.get('model_weight_bytes') or 0
+
+    def close(self):
+        self._closed = True  # Channels in use are closed when they are returned
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Function run in each benchmark client process: one app process classifying images
+def _benchmark_client(backend, images, result_queue, start_event):
+    from model_holder import ModelHolder
+
+    holder = ModelHolder(backend=backend)
+    model, _ = holder.get()
+    batch = np.random.default_rng(os.getpid()).uniform(-1.0, 1.0, size=(1,) + INPUT_SHAPE).astype(np.float32)
+    rss = current_rss_bytes()
+    start_event.wait()
+    start = time.perf_counter()
+    for _ in range(images):
+        model.predict(batch, batch_size=1, verbose=0)
+    result_queue.put((time.perf_counter() - start, rss))
+    if hasattr(model, 'close'):
+        model.close()
+
+
+# Function to compare N app processes each holding the model with N thin clients of one worker
+def benchmark(processes=4, images=200, local_backend='keras-compiled', socket_path=SOCKET_PATH):
+    import multiprocessing
+
+    def run(backend, worker_rss=0):
+        result_queue, start_event = multiprocessing.Queue(), multiprocessing.Event()
+        clients = [multiprocessing.Process(target=_benchmark_client, args=(backend, images, result_queue, start_event))
+                   for _ in range(processes)]
+        for client in clients:
+            client.start()
+        time.sleep(0.5)
+        start_event.set()
+        results = [result_queue.get() for _ in clients]
+        for client in clients:
+            client.join()
+        elapsed = max(seconds for seconds, _ in results)
+        total_rss = sum(rss for _, rss in results) + worker_rss
+        print(f"{backend:<15} {processes} processes: {processes * images / elapsed:8.1f} images/s, "
+              f"total RSS {total_rss / 2**20:8.0f} MiB")
+
+    run(local_backend)
+
+    worker = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--socket', socket_path],
+                              env=dict(os.environ, ECOSORT_BACKEND=local_backend))
+    try:
+        deadline = time.monotonic() + 300
+        while True:
+            try:
+                worker_info = RemoteModel(socket_path, reconnect_seconds=0).info()
+                break
+            except WorkerUnavailable:
+                if worker.poll() is not None or time.monotonic() > deadline:
+                    raise
+                time.sleep(1.0)  # Still loading the model
+        run('remote', worker_info['rss'])
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared out-of-process inference worker.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('serve', "Run one worker in this process"),
+                            ('supervise', "Run a worker and restart it whenever it exits")):
+        command = subcommands.add_parser(name, help=help_text)
+        command.add_argument('--socket', default=SOCKET_PATH)
+    bench = subcommands.add_parser('benchmark', help="Compare memory and throughput with N app processes")
+    bench.add_argument('--processes', type=int, default=4)
+    bench.add_argument('--images', type=int, default=200, help="Single-image requests per process")
+    bench.add_argument('--local-backend', default='keras-compiled')
+    bench.add_argument('--socket', default='/tmp/ecosort-inference-benchmark.sock')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.socket)
+    elif args.command == 'supervise':
+        supervise(args.socket)
+    else:
+        benchmark(args.processes, args.images, args.local_backend, args.socket)
+
+
+if __name__ == "__main__":
+    main()
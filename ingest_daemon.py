@@ -0,0 +1,301 @@
+import argparse
+import collections
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import diagnostics
+from bulk_classify import IMAGE_EXTENSIONS
+
+POLL_SECONDS = 1.0
+# A file must be unchanged for this long before it is picked up (the camera may still be writing)
+SETTLE_SECONDS = 0.5
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_QUEUE = 256
+BATCH_WAIT_SECONDS = 0.5
+STATUS_INTERVAL_SECONDS = 10.0
+# Waits before retrying a batch whose predict failed (e.g. the inference worker restarting)
+PREDICT_RETRY_SECONDS = (1.0, 2.0, 4.0)
+
+
+# Function to identify one version of a file: a camera can reuse a name, not a name plus mtime
+def file_key(name, stat):
+    return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ResultStore:
+    """
+    Append-only JSONL store of classification results, which doubles as the
+    checkpoint: a file whose key is in the store is never classified again.
+    - Each batch is flushed and fsynced before its files are moved, so a
+      crash can at worst leave classified files in the inbox, which are then
+      only moved on restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        self.done.add(json.loads(line)['key'])
+                    except (ValueError, KeyError):
+                        pass  # A partial last line from a crash mid-write
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write('\n')
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b'\n'
+
+    def append(self, rows):
+        self._file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(row['key'] for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class IngestDaemon:
+    """
+    Watches an inbox directory and classifies new camera images in batches.
+    - A scanner thread polls the inbox and puts settled files on a bounded
+      queue; when the queue is full it waits, so a flood of files never
+      piles up in memory.
+    - Files are preprocessed like preprocess_image in a thread pool, then
+      classified with one predict call per batch.
+    - Results (with suggestions) go to the append-only store, then files are
+      moved to `processed/` or `failed/`, or left in place with keep=True.
+    - A batch whose predict fails is retried with backoff; if it keeps
+      failing, its files are recorded and moved like decode errors.
+    """
+
+    def __init__(self, inbox, store_path, batch_size=DEFAULT_BATCH_SIZE, max_queue=DEFAULT_MAX_QUEUE,
+                 workers=None, keep=False, poll_seconds=POLL_SECONDS):
+        self.inbox = inbox
+        self.processed_dir = os.path.join(inbox, 'processed')
+        self.failed_dir = os.path.join(inbox, 'failed')
+        self.store = ResultStore(store_path)
+        self.batch_size = batch_size
+        self.keep = keep
+        self.poll_seconds = poll_seconds
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._queued = set()  # Keys on the queue or in the current batch
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 2))
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._lags = collections.deque(maxlen=1000)
+        self._started = time.perf_counter()
+        if not keep:
+            os.makedirs(self.processed_dir, exist_ok=True)
+            os.makedirs(self.failed_dir, exist_ok=True)
+
+    def _scan(self):
+        now = time.time()
+        found = 0  # Files still to classify (the inbox is idle when this stays 0)
+        with os.scandir(self.inbox) as entries:
+            entries = sorted((entry for entry in entries
+                              if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)),
+                             key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in entries:
+            stat = entry.stat()
+            key = file_key(entry.name, stat)
+            if key in self._queued:
+                continue
+            if now - stat.st_mtime < SETTLE_SECONDS:
+                found += 1  # Picked up on a later scan
+                continue
+            if key in self.store.done:
+                # Classified before a crash, but not yet moved
+                if not self.keep:
+                    self._move(entry.path, self.processed_dir, stat)
+                continue
+            found += 1
+            self._queued.add(key)
+            while not self._stop.is_set():
+                try:
+                    self._queue.put((entry.path, key, time.time()), timeout=0.5)
+                    break
+                except queue.Full:
+                    continue  # Backpressure: wait for the classifier to catch up
+        return found
+
+    def _scan_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._scan() == 0 and self._queue.empty():
+                    self._idle.set()
+                else:
+                    self._idle.clear()
+            except OSError as e:
+                print(f"scan failed: {e}", file=sys.stderr)
+            self._stop.wait(self.poll_seconds)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + BATCH_WAIT_SECONDS
+        while len(batch) < self.batch_size:
+            remaining = max(0.0, deadline - time.perf_counter())
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _move(self, path, directory, stat=None):
+        target = os.path.join(directory, os.path.basename(path))
+        if os.path.exists(target):
+            stem, extension = os.path.splitext(os.path.basename(path))
+            stat = stat or os.stat(path)
+            target = os.path.join(directory, f"{stem}.{stat.st_mtime_ns}{extension}")
+        try:
+            os.replace(path, target)
+        except FileNotFoundError:
+            pass  # Removed by someone else; the result is already stored
+
+    def _classify(self, batch, model, labels):
+        from classification_page import preprocess_image, top_k_labels, get_suggestions
+
+        def load(item):
+            try:
+                return preprocess_image(item[0]), None
+            except Exception as e:
+                return None, f"{type(e).__name__}: {e}"
+
+        loaded = list(self._pool.map(load, batch))
+        good = [i for i, (array, _) in enumerate(loaded) if array is not None]
+        predictions = []
+        if good:
+            images = np.concatenate([loaded[i][0] for i in good])
+            predictions = model.predict(images, batch_size=len(images), verbose=0)
+        rows_by_index = {}
+        now = time.time()
+        for row, i in enumerate(good):
+            top_k = top_k_labels(labels, predictions[row:row + 1])
+            rows_by_index[i] = {'label': top_k[0][0], 'confidence': top_k[0][1], 'top_k': top_k,
+                                'suggestions': get_suggestions(top_k[0][0]), 'error': None}
+        rows = []
+        for i, (path, key, detected_at) in enumerate(batch):
+            row = rows_by_index.get(i) or {'label': None, 'confidence': None, 'top_k': None,
+                                           'suggestions': None, 'error': loaded[i][1]}
+            rows.append(dict({'file': os.path.basename(path), 'key': key, 'detected_at': detected_at,
+                              'classified_at': now, 'queue_lag_seconds': round(now - detected_at, 4)}, **row))
+        return rows
+
+    def _classify_with_retry(self, batch):
+        from model_holder import get_model_holder
+
+        for delay in PREDICT_RETRY_SECONDS + (None,):
+            try:
+                model, labels = get_model_holder().get()
+                return self._classify(batch, model, labels)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if delay is None or self._stop.is_set():
+                    break
+                print(f"batch of {len(batch)} failed ({error}); retrying in {delay:.1f} s", file=sys.stderr)
+                self._stop.wait(delay)
+        # Like decode errors: the files go to failed/ with the reason in the store
+        now = time.time()
+        return [{'file': os.path.basename(path), 'key': key, 'detected_at': detected_at, 'classified_at': now,
+                 'queue_lag_seconds': round(now - detected_at, 4), 'label': None, 'confidence': None,
+                 'top_k': None, 'suggestions': None, 'error': error}
+                for path, key, detected_at in batch]
+
+    def _process_loop(self):
+        last_status = time.perf_counter()
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                rows = self._classify_with_retry(batch)
+                self.store.append(rows)  # The checkpoint: written before any file moves
+                for (path, key, _), row in zip(batch, rows):
+                    if not self.keep:
+                        self._move(path, self.failed_dir if row['error'] else self.processed_dir)
+                    self._queued.discard(key)
+                    self._lags.append(row['queue_lag_seconds'])
+                    diagnostics.observe('ingest_queue_lag', row['queue_lag_seconds'])
+                self.failed += sum(1 for row in rows if row['error'])
+                self.processed += len(rows)
+            if time.perf_counter() - last_status > STATUS_INTERVAL_SECONDS:
+                last_status = time.perf_counter()
+                print(self.status_line(), file=sys.stderr)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started
+        lags = np.array(self._lags) if self._lags else np.zeros(1)
+        return {'processed': self.processed, 'failed': self.failed, 'images_per_second': self.processed / elapsed,
+                'queue_depth': self._queue.qsize(), 'queue_lag_p50': float(np.percentile(lags, 50)),
+                'queue_lag_p95': float(np.percentile(lags, 95))}
+
+    def status_line(self):
+        stats = self.stats()
+        return (f"{stats['processed']} classified ({stats['failed']} failed), {stats['images_per_second']:.1f} images/s, "
+                f"queue {stats['queue_depth']}, lag p50 {stats['queue_lag_p50']:.2f} s / p95 {stats['queue_lag_p95']:.2f} s")
+
+    def run(self, exit_when_idle=False):
+        """
+        Run until stop() is called (or the inbox is drained, with exit_when_idle).
+        """
+        from model_holder import get_model_holder
+
+        get_model_holder().get()  # Load and warm before taking files
+        scanner = threading.Thread(target=self._scan_loop, name='inbox-scanner', daemon=True)
+        scanner.start()
+        processor = threading.Thread(target=self._process_loop, name='ingest-classifier', daemon=True)
+        processor.start()
+        try:
+            while processor.is_alive():
+                if exit_when_idle and self._idle.wait(0.5) and self._queue.empty() and not self._queued:
+                    break
+                processor.join(0.5)
+        finally:
+            self.stop()
+            processor.join()
+            self.store.close()
+            self._pool.shutdown()
+        return self.stats()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a directory and classify new camera images in batches.")
+    parser.add_argument('inbox', help="Directory the cameras drop images into")
+    parser.add_argument('--store', default='ingest_results.jsonl', help="Append-only results file (also the checkpoint)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="Files queued before the scanner waits")
+    parser.add_argument('--workers', type=int, help="Preprocessing threads")
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS, help="Seconds between inbox scans")
+    parser.add_argument('--keep', action='store_true', help="Leave files in place; the store marks them as done")
+    parser.add_argument('--exit-when-idle', action='store_true', help="Stop once the inbox is drained")
+    args = parser.parse_args()
+
+    daemon = IngestDaemon(args.inbox, args.store, args.batch_size, args.max_queue, args.workers, args.keep, args.poll)
+    # Finish the current batch on SIGTERM/Ctrl-C instead of dying mid-write
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    daemon.run(args.exit_when_idle)
+    print(daemon.status_line(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+LEADERBOARD_DB = os.environ.get("ECOSORT_LEADERBOARD_DB", "leaderboard.db")
+CACHE_SECONDS = 2.0
+PAGE_SIZE = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaderboard (
+    username TEXT PRIMARY KEY,
+    points INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leaderboard_points ON leaderboard (points DESC, username);
+"""
+
+
+class LeaderboardStore:
+    """
+    Shared leaderboard in SQLite (WAL mode), safe across threads and processes.
+    - Points only change by increments (single-statement upserts), so
+      concurrent sessions and processes never lose each other's points.
+    - Top-N pages use the points index; rank is a count over the same index,
+      with ties broken by username in both.
+    - Pages and ranks are cached in memory for a couple of seconds so reruns
+      do not hit the database; this process's writes clear the cache.
+    """
+
+    def __init__(self, path=LEADERBOARD_DB, cache_seconds=CACHE_SECONDS):
+        self.path = path
+        self.cache_seconds = cache_seconds
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread; sqlite3 connections must not be shared
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _cached(self, key, query):
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit is not None and now - hit[0] < self.cache_seconds:
+                return hit[1]
+        value = query()
+        with self._cache_lock:
+            self._cache[key] = (now, value)
+        return value
+
+    def _invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def add_points(self, username, delta):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO leaderboard (username, points, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET points = points + excluded.points, updated_at = excluded.updated_at",
+                (username, int(delta), time.time()),
+            )
+        self._invalidate()
+
+    def points(self, username):
+        """
+        Return a user's stored points (0 if they are not on the board), uncached.
+        """
+        row = self._connection().execute(
+            "SELECT points FROM leaderboard WHERE username = ?", (username,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def remove(self, username):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM leaderboard WHERE username = ?", (username,))
+        self._invalidate()
+
+    def top(self, page=0, page_size=PAGE_SIZE):
+        """
+        Return one page of (rank, username, points), highest points first.
+        """
+        def query():
+            rows = self._connection().execute(
+                "SELECT username, points FROM leaderboard ORDER BY points DESC, username LIMIT ? OFFSET ?",
+                (page_size, page * page_size),
+            ).fetchall()
+            return [(page * page_size + i + 1, username, points) for i, (username, points) in enumerate(rows)]
+        return self._cached(('top', page, page_size), query)
+
+    def rank(self, username):
+        """
+        Return (rank, points) for a user, or None if they are not on the board.
+        """
+        def query():
+            row = self._connection().execute(
+                "SELECT points FROM leaderboard WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            # Ties are broken by username, as in top()
+            ahead = self._connection().execute(
+                "SELECT COUNT(*) FROM leaderboard WHERE points > ? OR (points = ? AND username < ?)",
+                (row[0], row[0], username)).fetchone()[0]
+            return ahead + 1, row[0]
+        return self._cached(('rank', username), query)
+
+    def count(self):
+        return self._cached(('count',), lambda: self._connection().execute(
+            "SELECT COUNT(*) FROM leaderboard").fetchone()[0])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Function to get the process-wide leaderboard store
+def get_leaderboard_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LeaderboardStore()
+    return _store
+
+
+# Function run by each load-test writer process
+def _load_test_writer(path, users, operations, seed, result_queue):
+    store = LeaderboardStore(path, cache_seconds=0.0)
+    rng = random.Random(seed)
+    timings, added = [], 0
+    for _ in range(operations):
+        delta = rng.randint(5, 25)
+        start = time.perf_counter()
+        store.add_points(f"user{rng.randrange(users)}", delta)
+        timings.append(time.perf_counter() - start)
+        added += delta
+    result_queue.put((timings, added))
+
+
+# Function to load-test the store: bulk users, concurrent writer processes and readers
+def load_test(path, users=100_000, writers=8, operations=2_000, reads=2_000):
+    import multiprocessing
+
+    store = LeaderboardStore(path, cache_seconds=0.0)
+    start = time.perf_counter()
+    with store._connection() as connection:
+        connection.executemany(
+            "INSERT INTO leaderboard (username, points, updated_at) VALUES (?, ?, ?)",
+            ((f"user{i}", random.randint(0, 500), time.time()) for i in range(users)),
+        )
+    print(f"inserted {users} users in {time.perf_counter() - start:.2f} s")
+    points_before = store._connection().execute("SELECT SUM(points) FROM leaderboard").fetchone()[0]
+
+    result_queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_load_test_writer, args=(path, users, operations, seed, result_queue))
+        for seed in range(writers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    # Readers run in this process while the writers are busy
+    read_timings = []
+    rng = random.Random(writers)
+    for i in range(reads):
+        t = time.perf_counter()
+        if i % 2:
+            store.top(page=rng.randrange(100))
+        else:
+            store.rank(f"user{rng.randrange(users)}")
+        read_timings.append(time.perf_counter() - t)
+
+    write_timings, added = [], 0
+    for _ in processes:
+        timings, writer_added = result_queue.get()
+        write_timings.extend(timings)
+        added += writer_added
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    def describe(timings):
+        timings = np.array(timings) * 1000.0
+        return f"p50 {np.percentile(timings, 50):.2f} ms, p99 {np.percentile(timings, 99):.2f} ms"
+
+    print(f"{writers} writers x {operations} upserts: {len(write_timings) / elapsed:.0f} writes/s ({describe(write_timings)})")
+    print(f"{reads} reads during writes: {describe(read_timings)}")
+    # Every increment must be applied exactly once, whatever the interleaving
+    points_after = store._connection().execute("SELECT SUM(points) FROM leaderboard").fetchone()[0]
+    print(f"rows: {store.count()} (expected {users}); points added: {points_after - points_before} (expected {added})")
+    # Points tie often at this scale; rank() must break ties the way top() orders them
+    mismatched = sum(store.rank(user)[0] != rank for page in (0, rng.randrange(100)) for rank, user, _ in store.top(page))
+    print(f"rank() disagreeing with top() on two pages: {mismatched} (expected 0)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the SQLite leaderboard store.")
+    parser.add_argument('--db', default='leaderboard_loadtest.db')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=2_000, help="Upserts per writer")
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        parser.error(f"refusing to load-test an existing database: {args.db}")
+    try:
+        load_test(args.db, args.users, args.writers, args.operations)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+
+if __name__ == "__main__":
+    main()
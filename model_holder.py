@@ -0,0 +1,266 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+MODEL_PATH = 'waste_classification.h5'
+LABELS_PATH = 'labels.txt'
+INPUT_SHAPE = (224, 224, 3)
+# 'keras-compiled' (default), 'keras-xla', 'keras' (plain model.predict),
+# 'tflite-fp16', 'tflite-int8', 'cascade' or 'remote' (a separate inference worker)
+# (see compiled_inference.py, tflite_backend.py, cascade.py and inference_worker.py)
+MODEL_BACKEND = os.environ.get('ECOSORT_BACKEND', 'keras-compiled')
+# Seconds between checks for a changed model or labels file (get() runs once per batch)
+STALE_CHECK_SECONDS = float(os.environ.get('ECOSORT_MODEL_CHECK_SECONDS', '5'))
+
+
+# Function to hash a file in chunks so large models never sit in memory twice
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to read the resident memory of this process (None if unavailable)
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is the peak, reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+# Function to load a model for the given backend name
+def load_backend(backend, model_path=None):
+    if backend.startswith('tflite'):
+        from tflite_backend import TFLiteClassifier, TFLITE_MODEL_PATHS
+        return TFLiteClassifier(model_path or TFLITE_MODEL_PATHS[backend])
+
+    if backend == 'remote':
+        from inference_worker import RemoteModel
+        return RemoteModel()
+
+    if backend == 'cascade':
+        from cascade import load_cascade
+        return load_cascade(model_path or MODEL_PATH)
+
+    if backend == 'keras-compiled':
+        # Served from the on-disk SavedModel cache when this .h5 was exported before
+        from saved_model_cache import load_compiled
+        return load_compiled(model_path or MODEL_PATH)
+
+    from classification_page import load_model_func
+    model = load_model_func(model_path or MODEL_PATH)
+    if backend == 'keras':
+        return model
+    if backend == 'keras-xla':
+        from compiled_inference import CompiledModel
+        return CompiledModel(model, jit_compile=True)
+    raise ValueError(f"Unknown model backend: {backend}")
+
+
+# Function to size a model's parameters (the file size for TFLite models)
+def _model_bytes(model):
+    if hasattr(model, 'get_weights'):
+        return int(sum(np.asarray(w).nbytes for w in model.get_weights()))
+    return model.model_bytes()
+
+
+class ModelHolder:
+    """
+    Holds one copy of the classification model and its labels per process.
+    - Loads lazily on first use and warms up with a dummy forward pass.
+    - Reloads only when the model or labels file changes (mtime, then hash),
+      checked at most every `check_seconds`. The cascade watches both of its
+      models; with the 'remote' backend the worker owns the model and labels,
+      so no local file is checked.
+    - Records load time and memory use for display and monitoring.
+    """
+
+    def __init__(self, model_path=None, labels_path=LABELS_PATH, backend=MODEL_BACKEND, labels=None,
+                 check_seconds=STALE_CHECK_SECONDS):
+        if model_path is None and backend.startswith('tflite'):
+            from tflite_backend import TFLITE_MODEL_PATHS
+            model_path = TFLITE_MODEL_PATHS[backend]
+        self.model_path = model_path or MODEL_PATH
+        self.backend = backend
+        self._local_model = backend != 'remote'
+        # A fixed label list (e.g. utils.gen_labels()) replaces the labels file;
+        # a remote model brings the worker's labels
+        self.labels_path = labels_path if labels is None and self._local_model else None
+        self._fixed_labels = labels
+        self.check_seconds = check_seconds
+        self._lock = threading.RLock()
+        self._model = None
+        self._labels = None
+        self._mtimes = None
+        self._hashes = None
+        self._last_check = 0.0
+        self._stats = {
+            'loads': 0,
+            'load_seconds': None,
+            'warmup_seconds': None,
+            'rss_before_load': None,
+            'rss_after_load': None,
+            'model_weight_bytes': None,
+            'model_sha256': None,
+            'loaded_at': None,
+        }
+
+    def _model_files(self):
+        if not self._local_model:
+            return ()
+        if self.backend == 'cascade':
+            # A re-derived small model must reload the cascade too
+            from cascade import SMALL_MODEL_PATH
+            return (self.model_path, SMALL_MODEL_PATH)
+        return (self.model_path,)
+
+    def _current_mtimes(self):
+        return (tuple(os.path.getmtime(path) for path in self._model_files()),
+                os.path.getmtime(self.labels_path) if self.labels_path else None)
+
+    def _current_hashes(self):
+        hashes = [file_sha256(path) for path in self._model_files()]
+        if len(hashes) > 1:
+            model_hash = hashlib.sha256(''.join(hashes).encode()).hexdigest()
+        else:
+            model_hash = hashes[0] if hashes else None
+        return (model_hash, file_sha256(self.labels_path) if self.labels_path else None)
+
+    def _is_stale(self):
+        if self._model is None:
+            return True
+        now = time.monotonic()
+        if now - self._last_check < self.check_seconds:
+            return False
+        self._last_check = now
+        mtimes = self._current_mtimes()
+        if mtimes == self._mtimes:
+            return False
+        # The files were touched; only reload if their contents actually changed
+        hashes = self._current_hashes()
+        self._mtimes = mtimes
+        return hashes != self._hashes
+
+    def _load(self):
+        # Imported here to avoid a circular import with the page module
+        from classification_page import load_labels
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        model = load_backend(self.backend, self.model_path)
+        if self._fixed_labels is not None:
+            labels = list(self._fixed_labels)
+        elif not self._local_model:
+            labels = list(model.labels)
+        else:
+            labels = load_labels(self.labels_path)
+        load_seconds = time.perf_counter() - start
+
+        self._model = model
+        self._labels = labels
+        self._mtimes = self._current_mtimes()
+        self._hashes = self._current_hashes()
+        self._last_check = time.monotonic()
+        self._stats.update({
+            'loads': self._stats['loads'] + 1,
+            'load_seconds': load_seconds,
+            'rss_before_load': rss_before,
+            'rss_after_load': current_rss_bytes(),
+            'model_weight_bytes': _model_bytes(model),
+            'model_sha256': self._hashes[0],
+            'loaded_at': time.time(),
+        })
+        self._warm_up()
+
+        from diagnostics import record_model_load
+        record_model_load(self.info())
+
+    def _warm_up(self):
+        dummy = np.zeros((1,) + INPUT_SHAPE, dtype=np.float32)
+        start = time.perf_counter()
+        self._model.predict(dummy, verbose=0)
+        self._stats['warmup_seconds'] = time.perf_counter() - start
+
+    def get(self):
+        """
+        Return the (model, labels) pair, loading or reloading it if needed.
+        """
+        with self._lock:
+            if self._is_stale():
+                self._load()
+            return self._model, self._labels
+
+    def is_loaded(self):
+        return self._model is not None
+
+    def unload(self):
+        """
+        Drop the model so its memory can be reclaimed; the next get() reloads it.
+        """
+        with self._lock:
+            self._model = None
+            self._labels = None
+            self._mtimes = None
+
+    def info(self):
+        """
+        Return a snapshot of load timings and memory figures.
+        """
+        with self._lock:
+            info = dict(self._stats)
+        info['model_path'] = self.model_path
+        info['backend'] = self.backend
+        info['labels_path'] = self.labels_path
+        info['rss_now'] = current_rss_bytes()
+        if hasattr(self._model, 'escalation_rate'):
+            info['escalation_rate'] = self._model.escalation_rate()
+        return info
+
+
+_holder = None
+_holder_lock = threading.Lock()
+_warm_up_thread = None
+
+
+# Function to get the process-wide model holder (the registry's default model, ECOSORT_MODEL)
+def get_model_holder():
+    global _holder
+    if _holder is None:
+        with _holder_lock:
+            if _holder is None:
+                from model_registry import app_model_holder
+                _holder = app_model_holder()
+    return _holder
+
+
+# Function to load and warm the model in the background once per process
+def start_background_warm_up():
+    global _warm_up_thread
+    with _holder_lock:
+        if _warm_up_thread is not None:
+            return _warm_up_thread
+        _warm_up_thread = threading.Thread(target=_safe_warm_up, name='model-warm-up', daemon=True)
+        _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def _safe_warm_up():
+    try:
+        get_model_holder().get()
+    except Exception:
+        # The page reports loading errors itself when the model is requested
+        pass
@@ -0,0 +1,309 @@
+import argparse
+import collections
+import hashlib
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from diagnostics import stage
+from model_holder import ModelHolder, MODEL_PATH, LABELS_PATH, MODEL_BACKEND
+from preprocessing import to_model_input
+
+DEFAULT_MODEL = os.environ.get("ECOSORT_MODEL", "waste_classification")
+# Total parameter bytes kept loaded; least recently used models are unloaded beyond this
+MEMORY_BUDGET_BYTES = int(os.environ.get("ECOSORT_MODEL_MEMORY_BUDGET", str(1024 * 2**20)))
+# Share of traffic per model, e.g. "waste_classification:0.9,teachable_machine:0.1" (empty: no A/B test)
+AB_SPLIT = os.environ.get("ECOSORT_AB_SPLIT", "")
+LATENCY_SAMPLES = 1000
+
+
+# Function to get the Teachable Machine labels (utils imports TensorFlow, so only when needed)
+def _teachable_machine_labels():
+    from utils import gen_labels
+    return gen_labels()
+
+
+# name -> how to load the model, which labels go with it and its preprocessing contract
+MODELS = {
+    'waste_classification': {
+        'model_path': None,  # MODEL_PATH, or its export for a TFLite ECOSORT_BACKEND
+        'labels_path': LABELS_PATH,
+        'backend': MODEL_BACKEND,
+        'normalization': 'mobilenet_v2',  # keras.applications.mobilenet_v2.preprocess_input
+        'resample': Image.NEAREST,
+    },
+    'teachable_machine': {  # The utils.model_arc() / utils.gen_labels() pair
+        'model_path': 'keras.h5',
+        'labels': _teachable_machine_labels,
+        'backend': 'keras',
+        'normalization': 'unit',          # /255, as utils.preprocess
+        'resample': Image.BICUBIC,
+    },
+}
+
+
+# Function to add or replace a model in the registry
+def register_model(name, model_path, normalization, labels_path=None, labels=None,
+                   backend='keras', resample=Image.NEAREST):
+    if (labels_path is None) == (labels is None):
+        raise ValueError("Give exactly one of labels_path or labels")
+    MODELS[name] = {'model_path': model_path, 'labels_path': labels_path, 'labels': labels,
+                    'backend': backend, 'normalization': normalization, 'resample': resample}
+
+
+# Function to build a holder for a registered model
+def new_model_holder(name):
+    spec = MODELS[name]
+    labels = spec.get('labels')
+    return ModelHolder(spec['model_path'], spec.get('labels_path'), spec['backend'],
+                       labels=labels() if callable(labels) else labels)
+
+
+# Function to build the holder for the default model, which the pages, the API and the daemons serve
+def app_model_holder():
+    if DEFAULT_MODEL not in MODELS:
+        raise ValueError(f"Unknown ECOSORT_MODEL: {DEFAULT_MODEL}")
+    if MODELS[DEFAULT_MODEL]['normalization'] != 'mobilenet_v2':
+        # Everything outside the registry preprocesses with MobileNetV2 scaling
+        raise ValueError(f"ECOSORT_MODEL={DEFAULT_MODEL} does not take MobileNetV2 preprocessing")
+    return new_model_holder(DEFAULT_MODEL)
+
+
+# Function to parse an A/B split like "a:0.9,b:0.1" into normalized shares
+def parse_split(text):
+    shares = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, share = part.partition(':')
+        if name not in MODELS:
+            raise ValueError(f"Unknown model in A/B split: {name}")
+        shares[name] = float(share or 1.0)
+    total = sum(shares.values())
+    return {name: share / total for name, share in shares.items()} if total else {}
+
+
+class ModelRegistry:
+    """
+    Keeps the registered models, each with its own labels and preprocessing.
+    - Models load lazily on first use (through a ModelHolder each, so they
+      warm up and reload when their files change).
+    - Loaded models are kept within `memory_budget` bytes of parameters:
+      before a model loads, the least recently used ones (other than the
+      default) are unloaded to make room for its expected size.
+    - Every model is served through a micro-batching scheduler, the default
+      one through the app's shared scheduler, so both arms of an A/B test
+      run the way production traffic does.
+    - With an A/B split, route() sends a share of traffic to each model
+      (sticky per key) and latency is recorded per model for comparison.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET_BYTES, ab_split=AB_SPLIT):
+        self.memory_budget = memory_budget
+        self.ab_split = parse_split(ab_split) if isinstance(ab_split, str) else dict(ab_split or {})
+        self.default_model = DEFAULT_MODEL  # The app's model (see app_model_holder)
+        self._lock = threading.RLock()
+        self._holders = {}
+        self._load_locks = {}  # name -> lock held while that model loads
+        self._schedulers = {}
+        self._sizes = {}  # name -> parameter bytes measured at its last load
+        self._resident = collections.OrderedDict()  # name -> parameter bytes, least recently used first
+        self._latency = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_SAMPLES))
+        self._requests = collections.Counter()
+        self.evictions = 0
+
+    def _holder(self, name):
+        with self._lock:
+            holder = self._holders.get(name)
+        if holder is None:
+            # Built outside the lock: a labels callable may import TensorFlow
+            if name == self.default_model:
+                from model_holder import get_model_holder
+                holder = get_model_holder()  # The app's model; never load it twice
+            else:
+                holder = new_model_holder(name)
+            with self._lock:
+                holder = self._holders.setdefault(name, holder)
+                self._load_locks.setdefault(name, threading.Lock())
+        return holder
+
+    def _expected_bytes(self, name):
+        # The size measured at the last load, else the model file's size (close for float weights)
+        if name in self._sizes:
+            return self._sizes[name]
+        try:
+            return os.path.getsize(self._holders[name].model_path)
+        except OSError:
+            return 0
+
+    def _evict_down_to(self, limit, keep):
+        # Bookkeeping only (under the lock); the caller unloads the returned holders outside it.
+        # The default model serves most traffic, so it is never the one evicted
+        candidates = [other for other in self._resident if other not in (keep, self.default_model)]
+        evicted = []
+        while sum(self._resident.values()) > limit and candidates:
+            name = candidates.pop(0)
+            del self._resident[name]
+            evicted.append(self._holders[name])
+            self.evictions += 1
+        return evicted
+
+    def get(self, name=None):
+        """
+        Return (model, labels, spec) for a model, loading it and evicting others if needed.
+        A load holds only that model's lock, so other models keep serving meanwhile.
+        """
+        name = name or self.default_model
+        holder = self._holder(name)
+        if not holder.is_loaded():
+            with self._load_locks[name]:
+                if not holder.is_loaded():
+                    # Make room first, so the old and new models are never both over the budget
+                    with self._lock:
+                        self._resident.pop(name, None)
+                        evicted = self._evict_down_to(self.memory_budget - self._expected_bytes(name), keep=name)
+                    for other in evicted:
+                        other.unload()
+                    holder.get()
+        model, labels = holder.get()
+        with self._lock:
+            self._sizes[name] = self._resident[name] = holder.info()['model_weight_bytes'] or 0
+            self._resident.move_to_end(name)
+            evicted = self._evict_down_to(self.memory_budget, keep=name)  # In case the estimate was low
+        for other in evicted:
+            other.unload()
+        return model, labels, MODELS[name]
+
+    def _predict(self, name, batch):
+        model, _, _ = self.get(name)
+        return model.predict(batch, batch_size=len(batch), verbose=0)
+
+    def scheduler(self, name):
+        """
+        Return the micro-batching scheduler that serves a model.
+        """
+        from inference_scheduler import InferenceScheduler, get_scheduler
+
+        with self._lock:
+            if name not in self._schedulers:
+                if name == self.default_model:
+                    self._schedulers[name] = get_scheduler()  # The app's model and its shared queue
+                else:
+                    self._schedulers[name] = InferenceScheduler(lambda batch: self._predict(name, batch))
+            return self._schedulers[name]
+
+    def route(self, key=None):
+        """
+        Pick the model for a request. The same key (e.g. a user) always gets the same model.
+        """
+        if not self.ab_split:
+            return self.default_model
+        if key is None:
+            point = random.random()
+        else:
+            point = int(hashlib.sha256(str(key).encode()).hexdigest()[:8], 16) / 0x100000000
+        for name, share in self.ab_split.items():
+            point -= share
+            if point < 0:
+                return name
+        return name
+
+    def cache_namespace(self, name):
+        holder = self._holder(name)
+        return f"{name}:{holder.info()['model_sha256']}:top-k"
+
+    def classify(self, img, name=None, k=3):
+        """
+        Classify a decoded PIL image with one model, using that model's preprocessing,
+        through that model's scheduler. Returns the top-k [label, probability] pairs.
+        """
+        from classification_page import top_k_labels
+
+        name = name or self.default_model
+        _, labels, spec = self.get(name)
+        with stage('preprocess'):
+            image_data = to_model_input(img, normalization=spec['normalization'], resample=spec['resample'])
+        start = time.perf_counter()
+        with stage('predict'):
+            predictions = self.scheduler(name).predict(image_data)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latency[name].append(elapsed)
+            self._requests[name] += 1
+        return top_k_labels(labels, predictions, k)
+
+    def stats(self):
+        """
+        Return per-model request counts, latency percentiles and residency.
+        """
+        with self._lock:
+            latency = {name: np.array(samples) * 1000.0 for name, samples in self._latency.items() if samples}
+            stats = {
+                'memory_budget': self.memory_budget,
+                'resident': dict(self._resident),
+                'evictions': self.evictions,
+                'ab_split': dict(self.ab_split),
+                'models': {},
+            }
+            for name in MODELS:
+                row = {'requests': self._requests[name], 'loaded': name in self._resident}
+                if name in latency:
+                    row['latency_ms_p50'] = float(np.percentile(latency[name], 50))
+                    row['latency_ms_p95'] = float(np.percentile(latency[name], 95))
+                stats['models'][name] = row
+        return stats
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# Function to get the process-wide model registry
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+# Function to run every available model on the same images and compare latency and labels
+def compare(image_paths, names=None, runs=3):
+    from upload_ingest import ingest_upload
+
+    names = names or [name for name, spec in MODELS.items() if os.path.exists(spec['model_path'] or MODEL_PATH)]
+    registry = ModelRegistry(memory_budget=float('inf'))
+    images = [ingest_upload(path) for path in image_paths]
+    answers = {}
+    for name in names:
+        registry.get(name)  # Load and warm outside the timings
+        for _ in range(runs):
+            answers[name] = [registry.classify(img, name)[0][0] for img in images]
+    for name, row in registry.stats()['models'].items():
+        if name in answers:
+            print(f"{name:<22} p50 {row['latency_ms_p50']:7.1f} ms   p95 {row['latency_ms_p95']:7.1f} ms")
+    if len(answers) > 1:
+        first, *others = names
+        for other in others:
+            agreement = np.mean([a == b for a, b in zip(answers[first], answers[other])])
+            print(f"{first} and {other} agree on {agreement:.0%} of {len(images)} images")
+
+
+def main():
+    from bulk_classify import iter_image_paths
+
+    parser = argparse.ArgumentParser(description="Compare the registered models on a directory of images.")
+    parser.add_argument('image_dir')
+    parser.add_argument('--models', nargs='+', choices=sorted(MODELS), help="Default: every model whose file exists")
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    paths = list(iter_image_paths(args.image_dir))[:args.limit]
+    compare(paths, args.models, args.runs)
+
+
+if __name__ == "__main__":
+    main()
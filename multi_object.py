@@ -0,0 +1,217 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from cascade import to_probabilities
+from model_holder import INPUT_SHAPE
+from preprocessing import DISPLAY_MAX_SIDE, normalize_batch
+from upload_ingest import ingest_upload, UploadRejected
+
+PROPOSAL_MAX_SIDE = 512  # Regions are proposed on a small copy; boxes are scaled back up
+MIN_AREA_FRACTION = 0.01
+MAX_OBJECTS = 8
+IOU_THRESHOLD = 0.3
+BOX_PADDING = 0.08
+BUNDLED_IMAGES = ('kashish.jpg', 'tejas.jpg', 'vidhi.jpg')
+
+
+# Function to propose candidate object boxes from contours of edges and foreground
+def propose_regions(pixels, min_area_fraction=MIN_AREA_FRACTION):
+    """
+    Return (boxes, scores) for an RGB uint8 array, boxes as (x0, y0, x1, y1)
+    in pixel coordinates and scores as the contour area fraction.
+    """
+    height, width = pixels.shape[:2]
+    scale = min(1.0, PROPOSAL_MAX_SIDE / max(height, width))
+    small = cv2.resize(pixels, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+    # Edges find textured items; Otsu finds items that differ from a plain background
+    edges = cv2.Canny(gray, 50, 150)
+    _, foreground = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.mean(foreground) > 127:
+        foreground = 255 - foreground  # Keep the minority (objects), not the background
+    mask = cv2.morphologyEx(edges | foreground, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = min_area_fraction * small.shape[0] * small.shape[1]
+    boxes, scores = [], []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        boxes.append((x, y, x + w, y + h))
+        scores.append(area / (small.shape[0] * small.shape[1]))
+    if not boxes:
+        return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    boxes = np.array(boxes, dtype=np.float32)
+    # Pad each box a little so the item is not cut at its edges, then map back to full size
+    pad = BOX_PADDING * np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    boxes += np.stack([-pad, -pad, pad, pad], axis=1)
+    boxes = np.clip(boxes / scale, 0, [width, height, width, height]).round().astype(np.int32)
+    return boxes, np.array(scores, dtype=np.float32)
+
+
+# Function to drop boxes that overlap a higher-scoring box (greedy non-maximum suppression)
+def non_max_suppression(boxes, scores, iou_threshold=IOU_THRESHOLD, max_boxes=MAX_OBJECTS):
+    order = np.argsort(scores)[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size and len(keep) < max_boxes:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        x0 = np.maximum(boxes[best, 0], boxes[rest, 0])
+        y0 = np.maximum(boxes[best, 1], boxes[rest, 1])
+        x1 = np.minimum(boxes[best, 2], boxes[rest, 2])
+        y1 = np.minimum(boxes[best, 3], boxes[rest, 3])
+        intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        iou = intersection / (areas[best] + areas[rest] - intersection)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+# Function to cut every box out of one decoded image and resize it to the model input in one gather
+def extract_crops(pixels, boxes):
+    """
+    Return a (n, 224, 224, 3) uint8 batch. Each crop is resized with nearest-
+    neighbour sampling (like to_model_input), built as one fancy-indexing
+    gather over the already-decoded pixels: no per-crop decode or resize call.
+    """
+    height, width = INPUT_SHAPE[:2]
+    steps_y = (np.arange(height) + 0.5) / height
+    steps_x = (np.arange(width) + 0.5) / width
+    ys = (boxes[:, 1:2] + steps_y * (boxes[:, 3:4] - boxes[:, 1:2])).astype(np.int64)
+    xs = (boxes[:, 0:1] + steps_x * (boxes[:, 2:3] - boxes[:, 0:1])).astype(np.int64)
+    ys = np.clip(ys, 0, pixels.shape[0] - 1)
+    xs = np.clip(xs, 0, pixels.shape[1] - 1)
+    return pixels[ys[:, :, None], xs[:, None, :]]
+
+
+# Function to run the shared model on one batch
+def _predict_with_shared_model(batch):
+    from inference_scheduler import get_scheduler
+
+    return get_scheduler().predict(batch)
+
+
+# Function to find, crop and classify every object in a photo with one forward pass
+def classify_objects(source, labels, predict_fn=_predict_with_shared_model, max_objects=MAX_OBJECTS):
+    """
+    Return a list of {'box', 'label', 'confidence', 'suggestions'} dicts, one
+    per object, most confident first. The image is decoded once; if no
+    regions are found the whole image is classified as one object.
+    """
+    from classification_page import get_suggestions
+
+    img = source if hasattr(source, 'mode') else ingest_upload(source, max_side=DISPLAY_MAX_SIDE)
+    pixels = np.asarray(img)
+    boxes, scores = propose_regions(pixels)
+    if len(boxes):
+        boxes = boxes[non_max_suppression(boxes, scores, max_boxes=max_objects)]
+    else:
+        boxes = np.array([[0, 0, pixels.shape[1], pixels.shape[0]]], dtype=np.int32)
+    probabilities = to_probabilities(predict_fn(normalize_batch(extract_crops(pixels, boxes))))
+    objects = []
+    for box, row in zip(boxes, probabilities):
+        best = int(np.argmax(row))
+        objects.append({'box': [int(v) for v in box], 'label': labels[best], 'confidence': float(row[best]),
+                        'suggestions': get_suggestions(labels[best])})
+    objects.sort(key=lambda item: item['confidence'], reverse=True)
+    return objects
+
+
+# Function to draw the object boxes and labels on a copy of the image
+def draw_objects(img, objects):
+    pixels = np.array(img)
+    for index, item in enumerate(objects, start=1):
+        x0, y0, x1, y1 = item['box']
+        cv2.rectangle(pixels, (x0, y0), (x1, y1), (46, 125, 50), 3)
+        cv2.putText(pixels, f"{index}. {item['label']}", (x0 + 4, max(y0 + 22, 22)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (46, 125, 50), 2)
+    return pixels
+
+
+# Function to build a synthetic bin photo with `count` items on a plain background
+def synthetic_scene(count, size=(1024, 768), seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    scene = np.full((height, width, 3), 235, dtype=np.uint8)
+    side = min(width, height) // 4
+    items = [cv2.cvtColor(cv2.resize(cv2.imread(name), (side, side)), cv2.COLOR_BGR2RGB) for name in BUNDLED_IMAGES]
+    columns = width // (side + 20)
+    for index in range(count):
+        row, column = divmod(index, columns)
+        x = 10 + column * (side + 20) + int(rng.integers(0, 10))
+        y = 10 + row * (side + 20) + int(rng.integers(0, 10))
+        scene[y:y + side, x:x + side] = items[index % len(items)]
+    return scene
+
+
+# Function to show the multi-object upload section of the classification page
+def show_multi_object_section(labels):
+    uploaded_file = st.file_uploader("Choose a photo with several items...", type=["jpg", "jpeg", "png"],
+                                     key="multiObjectUploader")
+    if uploaded_file is None:
+        return
+    from classification_page import decoded_upload, upload_preview
+
+    try:
+        img = decoded_upload(uploaded_file, "objects")  # Decoded once per upload, kept across reruns
+    except UploadRejected as e:
+        st.error(f"This image cannot be classified: {e}")
+        return
+    if not st.button("Find and Classify Items", key="classifyObjectsButton"):
+        st.image(upload_preview("objects"), use_column_width=True)
+        return
+    with st.spinner('Finding items...'):
+        objects = classify_objects(img, labels)
+    st.image(draw_objects(img, objects), use_column_width=True)
+    for index, item in enumerate(objects, start=1):
+        with st.expander(f"{index}. **{item['label']}** ({item['confidence']:.0%})"):
+            for suggestion in item['suggestions']:
+                st.markdown(f'<div class="suggestion">{suggestion}</div>', unsafe_allow_html=True)
+
+
+# Function to time classify_objects for scenes with an increasing number of items
+def benchmark(counts=(1, 2, 4, 8), runs=10):
+    from model_holder import get_model_holder
+    from PIL import Image
+
+    model, labels = get_model_holder().get()
+
+    def predict(batch):
+        return model.predict(batch, batch_size=len(batch), verbose=0)
+
+    for count in counts:
+        img = Image.fromarray(synthetic_scene(count))
+        found = len(classify_objects(img, labels, predict))  # Warm-up, and one shape per batch size
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            classify_objects(img, labels, predict)
+            timings.append(time.perf_counter() - start)
+        median = float(np.median(timings) * 1000.0)
+        print(f"{count} items ({found} found): {median:7.1f} ms per photo, {median / max(found, 1):6.1f} ms per object")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and classify several items in one photo.")
+    parser.add_argument('image', nargs='?', help="Photo to classify (omit to benchmark synthetic scenes)")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    if args.image is None:
+        benchmark(runs=args.runs)
+        return
+    from model_holder import get_model_holder
+
+    model, labels = get_model_holder().get()
+    for item in classify_objects(args.image, labels, lambda batch: model.predict(batch, batch_size=len(batch), verbose=0)):
+        print(f"{item['label']:<12} {item['confidence']:.2f}  box {item['box']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Page name -> (module, render function). Modules are imported on first visit.
+PAGES = {
+    "Home": ("home_page", "show_home_page"),
+    "Classification": ("classification_page", "show_classification_page"),
+    "Sustainability Practices": ("sustainability_page", "show_sustainability_page"),
+    "Gamification": ("game_page", "show_gamification_page"),
+    "About": ("about_page", "show_about_page"),
+    "Contact Us": ("contact_page", "show_contact_page"),
+    "Diagnostics": ("diagnostics_page", "show_diagnostics_page"),
+}
+# Pages kept out of the sidebar unless switched on
+HIDDEN_PAGES = {"Diagnostics": "ECOSORT_DIAGNOSTICS"}
+
+# Seconds spent importing each page module in this process (first import only)
+IMPORT_SECONDS = {}
+_import_lock = threading.Lock()
+
+
+# Function to list the pages shown in the sidebar
+def visible_pages():
+    return tuple(
+        page for page in PAGES
+        if page not in HIDDEN_PAGES or os.environ.get(HIDDEN_PAGES[page]) == "1"
+    )
+
+
+# Function to import a page module on demand and return its render function
+def load_page(page):
+    module_name, function_name = PAGES[page]
+    module = sys.modules.get(module_name)
+    if module is None:
+        with _import_lock:
+            module = sys.modules.get(module_name)
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                IMPORT_SECONDS[module_name] = time.perf_counter() - start
+    return getattr(module, function_name)
+
+
+# Function to measure the cold import cost of a module in a fresh interpreter
+def measure_cold_import(module_name):
+    script = (
+        "import json, sys, time\n"
+        "import streamlit\n"
+        "start = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "seconds = time.perf_counter() - start\n"
+        "heavy = sorted(m for m in ('tensorflow', 'keras') if m in sys.modules)\n"
+        "print(json.dumps({'seconds': seconds, 'heavy_modules': heavy}))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=here, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Function to print the cold import cost of every page
+def main():
+    print(f"{'page':<26}{'module':<22}{'import (s)':>12}  heavy modules")
+    for page, (module_name, _) in PAGES.items():
+        try:
+            measured = measure_cold_import(module_name)
+        except subprocess.CalledProcessError as e:
+            print(f"{page:<26}{module_name:<22}{'failed':>12}  {e.stderr.strip().splitlines()[-1]}")
+            continue
+        heavy = ", ".join(measured['heavy_modules']) or "-"
+        print(f"{page:<26}{module_name:<22}{measured['seconds']:>12.3f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
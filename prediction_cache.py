@@ -0,0 +1,240 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ECOSORT_CACHE_SIZE", "1024"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("ECOSORT_CACHE_TTL", "3600"))
+# Hamming distance (out of 64 bits) for near-duplicate hits; negative disables it
+DEFAULT_PHASH_DISTANCE = int(os.environ.get("ECOSORT_CACHE_PHASH_DISTANCE", "-1"))
+DEFAULT_DISK_DIR = os.environ.get("ECOSORT_CACHE_DIR") or None
+# Files kept in the disk tier; expired and oldest files are pruned beyond this
+DEFAULT_DISK_MAX_ENTRIES = int(os.environ.get("ECOSORT_CACHE_DISK_SIZE", "10000"))
+DISK_PRUNE_EVERY = 100  # Disk writes between prunes
+
+
+# Function to compute a 64-bit difference hash (dHash) of an encoded image
+def perceptual_hash(image_bytes):
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Draft mode lets JPEG decode straight to a tiny greyscale image
+        img.draft('L', (64, 64))
+        pixels = list(img.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class PredictionCache:
+    """
+    Caches predictions by image content in front of the model.
+    - Exact hits use a SHA-256 of the encoded bytes.
+    - Optional near-duplicate hits compare perceptual hashes within
+      `phash_distance` bits (useful for repeated webcam captures).
+    - Memory entries are bounded and evicted least-recently-used or after
+      `ttl_seconds`; an optional directory keeps exact entries across restarts,
+      bounded by `disk_max_entries` files. Disk writes are best-effort.
+    - `namespace` (e.g. the model hash) keeps results from different models apart.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 phash_distance=DEFAULT_PHASH_DISTANCE, disk_dir=DEFAULT_DISK_DIR,
+                 disk_max_entries=DEFAULT_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_distance = phash_distance
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries = collections.OrderedDict()  # key -> (value, phash, stored_at, namespace)
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._disk_writes = 0
+        self._counters = collections.Counter()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.prune_disk()
+
+    def _key(self, image_bytes, namespace):
+        # Hash incrementally so a large upload is never copied to build the key
+        digest = hashlib.sha256(namespace.encode() + b'\0')
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds and now - stored_at > self.ttl_seconds
+
+    def _phash(self, image_bytes):
+        if self.phash_distance < 0:
+            return None
+        try:
+            return perceptual_hash(image_bytes)
+        except Exception:
+            return None
+
+    def get(self, image_bytes, namespace=''):
+        """
+        Return (value, phash) where value is the cached prediction or None.
+        Pass the phash back to put() to avoid hashing the image twice.
+        """
+        key = self._key(image_bytes, namespace)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[2], now):
+                self._entries.move_to_end(key)
+                self._counters['exact_hits'] += 1
+                return entry[0], entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self._counters['expired'] += 1
+
+        value = self._read_disk(key, now)
+        if value is not None:
+            self._store(key, value, None, now, namespace)
+            self._count('disk_hits')
+            return value, None
+
+        phash = self._phash(image_bytes)
+        if phash is not None:
+            with self._lock:
+                for other_key, (value, other_phash, stored_at, other_namespace) in reversed(self._entries.items()):
+                    if (other_phash is not None and other_namespace == namespace
+                            and not self._expired(stored_at, now)
+                            and _hamming(phash, other_phash) <= self.phash_distance):
+                        self._entries.move_to_end(other_key)
+                        self._counters['near_duplicate_hits'] += 1
+                        return value, phash
+        self._count('misses')
+        return None, phash
+
+    def put(self, image_bytes, value, namespace='', phash=None):
+        key = self._key(image_bytes, namespace)
+        if phash is None:
+            phash = self._phash(image_bytes)
+        now = time.time()
+        self._store(key, value, phash, now, namespace)
+        if self.disk_dir:
+            self._write_disk(key, value, now)
+
+    def _write_disk(self, key, value, now):
+        # A unique temp file per write: two sessions may store the same image at once
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=self.disk_dir, suffix='.tmp', delete=False) as file:
+                tmp_path = file.name
+                json.dump({'value': value, 'stored_at': now}, file)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            # The memory tier already has the entry; the disk tier is best-effort
+            self._count('disk_write_errors')
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_EVERY == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """
+        Remove expired files and, beyond `disk_max_entries`, the oldest ones.
+        Returns the number of files removed.
+        """
+        if not self.disk_dir or not self._prune_lock.acquire(blocking=False):
+            return 0  # Another thread is already pruning
+        try:
+            now = time.time()
+            files = []
+            with os.scandir(self.disk_dir) as entries:
+                for entry in entries:
+                    try:
+                        files.append((entry.stat().st_mtime, entry.path, entry.name.endswith('.tmp')))
+                    except OSError:
+                        pass
+            files.sort()
+            kept = sum(1 for _, _, is_tmp in files if not is_tmp)
+            removed = 0
+            for mtime, path, is_tmp in files:
+                if is_tmp:
+                    stale = now - mtime > 60  # Left behind by a crashed writer
+                else:
+                    stale = self._expired(mtime, now) or kept > self.disk_max_entries
+                if not stale:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed += 1
+                kept -= not is_tmp
+            if removed:
+                with self._lock:
+                    self._counters['disk_pruned'] += removed
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _store(self, key, value, phash, now, namespace):
+        with self._lock:
+            self._entries[key] = (value, phash, now, namespace)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r') as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if self._expired(stored['stored_at'], now):
+            return None
+        return stored['value']
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        hits = sum(stats.get(name, 0) for name in ('exact_hits', 'near_duplicate_hits', 'disk_hits'))
+        lookups = hits + stats.get('misses', 0)
+        stats['hit_rate'] = hits / lookups if lookups else None
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to get the process-wide prediction cache
+def get_prediction_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache()
+    return _cache
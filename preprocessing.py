@@ -0,0 +1,162 @@
+import io
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from model_holder import INPUT_SHAPE
+
+TARGET_SIZE = INPUT_SHAPE[1::-1]  # PIL sizes are (width, height)
+# Largest side kept when an image is decoded for display as well as the model
+DISPLAY_MAX_SIDE = 1024
+
+# Normalization contracts: (scale, offset) applied as x * scale + offset
+NORMALIZATIONS = {
+    'mobilenet_v2': (1.0 / 127.5, -1.0),  # keras.applications.mobilenet_v2.preprocess_input
+    'unit': (1.0 / 255.0, 0.0),           # plain /255, used by utils.preprocess
+}
+
+_buffers = threading.local()
+
+
+# Function to decode an image once, letting JPEG skip full-resolution decoding
+def decode_image(source, max_side=None):
+    """
+    Decode a path, file-like object or bytes into an RGB PIL image.
+    - For JPEGs, draft mode decodes at the smallest 1/2, 1/4 or 1/8 scale
+      that still covers `max_side` (default: the model input size), so a
+      12-megapixel photo never has to be decoded at full size.
+    - The result can be shown to the user and passed to to_model_input().
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+    img = Image.open(source)
+    side = max_side or max(TARGET_SIZE)
+    img.draft('RGB', (side, side))
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.BILINEAR)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    else:
+        img.load()
+    return img
+
+
+# Function to get this thread's reusable single-image input buffer
+def thread_buffer():
+    if getattr(_buffers, 'array', None) is None:
+        _buffers.array = np.empty((1,) + INPUT_SHAPE, dtype=np.float32)
+    return _buffers.array
+
+
+# Function to resize a decoded image and normalize it into a float32 buffer
+def to_model_input(img, out=None, normalization='mobilenet_v2', resample=Image.NEAREST):
+    """
+    Return a (1, 224, 224, 3) float32 array for the model.
+    - The image is resized straight to 224x224 (nearest-neighbour by default,
+      matching keras load_img) and converted without intermediate copies.
+    - Pass `out` (e.g. thread_buffer()) to fill a reused array in place.
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != TARGET_SIZE:
+        img = img.resize(TARGET_SIZE, resample)
+    if out is None:
+        out = np.empty((1,) + INPUT_SHAPE, dtype=np.float32)
+    scale, offset = NORMALIZATIONS[normalization]
+    np.copyto(out[0], np.asarray(img), casting='unsafe')
+    out *= scale
+    if offset:
+        out += offset
+    return out
+
+
+# Function to decode and preprocess an image for the model in one step
+def preprocess(source, out=None, normalization='mobilenet_v2'):
+    return to_model_input(decode_image(source), out=out, normalization=normalization)
+
+
+# Function to decode and resize to a uint8 model-sized array (cheap to send between processes)
+def decode_to_uint8(source):
+    img = decode_image(source)
+    if img.size != TARGET_SIZE:
+        img = img.resize(TARGET_SIZE, Image.NEAREST)
+    return np.asarray(img, dtype=np.uint8)
+
+
+# Function to normalize a uint8 batch into a new float32 batch
+def normalize_batch(batch, normalization='mobilenet_v2'):
+    scale, offset = NORMALIZATIONS[normalization]
+    images = batch.astype(np.float32)
+    images *= scale
+    if offset:
+        images += offset
+    return images
+
+
+# Function reproducing the old path: full decode, then keras-style array copies
+def _legacy_preprocess(image_bytes):
+    img = Image.open(io.BytesIO(image_bytes))
+    img.load()  # The upload was decoded once at full size for display...
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')  # ...and again for the model
+    img = img.resize(TARGET_SIZE, Image.NEAREST)
+    array = np.asarray(img, dtype=np.float32)       # img_to_array
+    array = np.expand_dims(array, axis=0)            # expand_dims
+    return array / 127.5 - 1.0                       # preprocess_input
+
+
+# Function to encode a synthetic photo-like JPEG of the given size
+def synthetic_jpeg(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    # Smooth gradients plus noise compress like a photo rather than pure noise
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = (pixels + rng.integers(0, 32, size=pixels.shape)).clip(0, 255).astype(np.uint8)
+    encoded = io.BytesIO()
+    Image.fromarray(pixels).save(encoded, format='JPEG', quality=90)
+    return encoded.getvalue()
+
+
+# Function to compare the old and new paths on a synthetic 12-megapixel JPEG
+def benchmark(width=4000, height=3000, runs=5):
+    image_bytes = synthetic_jpeg(width, height)
+
+    def new_path(data):
+        img = decode_image(data, max_side=DISPLAY_MAX_SIDE)  # Shown to the user
+        return to_model_input(img, out=thread_buffer())      # Same decode feeds the model
+
+    results = {}
+    for name, run in (('legacy', _legacy_preprocess), ('single-decode', new_path)):
+        run(image_bytes)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run(image_bytes)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        run(image_bytes)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {'median_ms': float(np.median(timings) * 1000.0), 'numpy_peak_bytes': peak}
+
+    full_width, full_height = Image.open(io.BytesIO(image_bytes)).size
+    draft = Image.open(io.BytesIO(image_bytes))
+    draft.draft('RGB', (DISPLAY_MAX_SIDE, DISPLAY_MAX_SIDE))
+    draft_width, draft_height = draft.size
+    results['legacy']['decoded_bytes'] = 2 * full_width * full_height * 3
+    results['single-decode']['decoded_bytes'] = draft_width * draft_height * 3
+    return results
+
+
+def main():
+    for name, row in benchmark().items():
+        print(f"{name:<14} {row['median_ms']:8.1f} ms   decoded pixels {row['decoded_bytes'] / 2**20:7.1f} MiB   "
+              f"array allocations peak {row['numpy_peak_bytes'] / 2**20:6.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from model_holder import INPUT_SHAPE, MODEL_PATH, file_sha256
+
+CACHE_DIR = os.environ.get("ECOSORT_MODEL_CACHE_DIR", ".model_cache")
+# Set ECOSORT_MODEL_CACHE=0 to always rebuild the model from the .h5 file
+CACHE_ENABLED = os.environ.get("ECOSORT_MODEL_CACHE", "1") != "0"
+
+
+class SavedModelClassifier:
+    """
+    Serves a model exported by export_saved_model().
+    - Loading restores the traced forward pass and its variables directly,
+      with no Keras layer reconstruction (so no CustomDepthwiseConv2D shim)
+      and no retracing.
+    - predict() mirrors keras Model.predict, like CompiledModel.
+    """
+
+    def __init__(self, path):
+        import tensorflow as tf
+
+        self.path = path
+        self._tf = tf
+        self._loaded = tf.saved_model.load(path)
+        self._forward = self._loaded.serve
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        images = self._tf.convert_to_tensor(np.asarray(batch, dtype=np.float32))
+        return self._forward(images).numpy()
+
+    def get_weights(self):
+        return [variable.numpy() for variable in self._loaded.variables]
+
+
+# Function to find the cache entry for a model file: keyed by its content and the TensorFlow version
+def cache_path(model_path=MODEL_PATH, cache_dir=CACHE_DIR):
+    import tensorflow as tf
+
+    return os.path.join(cache_dir, f"{file_sha256(model_path)}-tf{tf.__version__}")
+
+
+# Function to export a Keras model's traced forward pass as a SavedModel, atomically
+def export_saved_model(model, path):
+    import tensorflow as tf
+
+    module = tf.Module()
+    module.model = model  # Tracks the variables
+    module.serve = tf.function(
+        lambda images: model(images, training=False),
+        input_signature=[tf.TensorSpec(shape=(None,) + INPUT_SHAPE, dtype=tf.float32)],
+    )
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written next to the final path, then renamed, so other processes never see half an export
+    tmp_path = tempfile.mkdtemp(prefix='.export-', dir=os.path.dirname(path) or '.')
+    try:
+        tf.saved_model.save(module, tmp_path)
+        os.rename(tmp_path, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+        # Another process finished the same export first
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+# Function to load the ready-to-serve model, from the cache when possible
+def load_compiled(model_path=MODEL_PATH, cache_dir=CACHE_DIR, enabled=CACHE_ENABLED):
+    """
+    Return a model for the 'keras-compiled' backend.
+    - Cache hit: a SavedModelClassifier, without touching the .h5 file's layers.
+    - Cache miss: the .h5 is loaded through Keras as before, served with
+      CompiledModel, and exported so that later processes hit the cache.
+    """
+    from compiled_inference import CompiledModel
+
+    if enabled:
+        path = cache_path(model_path, cache_dir)
+        if os.path.isdir(path):
+            try:
+                return SavedModelClassifier(path)
+            except Exception:
+                shutil.rmtree(path, ignore_errors=True)  # Damaged entry; rebuild it below
+
+    from classification_page import load_model_func
+
+    model = load_model_func(model_path)
+    if enabled:
+        try:
+            export_saved_model(model, path)
+        except Exception as e:
+            # Serving does not depend on the cache; the next process tries again
+            print(f"Could not cache the compiled model: {e}", file=sys.stderr)
+    return CompiledModel(model)
+
+
+# Function to remove every cache entry
+def clear_cache(cache_dir=CACHE_DIR):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# Function to time a fresh interpreter from start to its first prediction
+def time_to_first_prediction(env):
+    script = ("import time; start = time.perf_counter()\n"
+              "import numpy as np\n"
+              "from model_holder import ModelHolder, INPUT_SHAPE\n"
+              "model, _ = ModelHolder(backend='keras-compiled').get()\n"
+              "model.predict(np.zeros((1,) + INPUT_SHAPE, dtype=np.float32))\n"
+              "print(type(model).__name__, time.perf_counter() - start)\n")
+    result = subprocess.run([sys.executable, '-c', script], env=dict(os.environ, **env),
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    name, seconds = result.stdout.strip().splitlines()[-1].split()
+    return name, float(seconds)
+
+
+# Function to compare cold starts without the cache, while filling it, and from it
+def cold_start_report(runs=3):
+    cache_dir = tempfile.mkdtemp(prefix='ecosort-model-cache-')
+    try:
+        cases = (
+            ('no cache', {'ECOSORT_MODEL_CACHE': '0'}, False),
+            ('cache miss (exports)', {'ECOSORT_MODEL_CACHE_DIR': cache_dir}, True),
+            ('cache hit', {'ECOSORT_MODEL_CACHE_DIR': cache_dir}, False),
+        )
+        for name, env, clear_first in cases:
+            timings = []
+            for _ in range(runs):
+                if clear_first:
+                    clear_cache(cache_dir)
+                served_by, seconds = time_to_first_prediction(env)
+                timings.append(seconds)
+            print(f"{name:<22} {np.median(timings):6.2f} s to first prediction "
+                  f"(median of {runs}, served by {served_by})")
+    finally:
+        clear_cache(cache_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="On-disk cache of the ready-to-serve model, keyed by the .h5 hash.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    export = subcommands.add_parser('export', help="Fill the cache now (e.g. while building an image)")
+    export.add_argument('--model', default=MODEL_PATH)
+    subcommands.add_parser('clear', help="Remove every cached model")
+    report = subcommands.add_parser('coldstart', help="Time a new process to its first prediction, with and without the cache")
+    report.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    if args.command == 'export':
+        model = load_compiled(args.model, enabled=True)
+        print(f"{cache_path(args.model)} ({type(model).__name__})")
+    elif args.command == 'clear':
+        clear_cache()
+    else:
+        cold_start_report(args.runs)
+
+
+if __name__ == "__main__":
+    main()
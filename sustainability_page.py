@@ -32,4 +32,5 @@ def show_sustainability_page():
     Small actions lead to big change. Let's all do our part for a sustainable future!
     """)
 
-show_sustainability_page()
+if __name__ == "__main__":
+    show_sustainability_page()
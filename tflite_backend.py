@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from model_holder import MODEL_PATH, INPUT_SHAPE, current_rss_bytes, load_backend
+
+TFLITE_MODEL_PATHS = {
+    'tflite-fp16': 'waste_classification_fp16.tflite',
+    'tflite-int8': 'waste_classification_int8.tflite',
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# Function to get a TFLite interpreter class, preferring the small runtime on edge devices
+def _interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteClassifier:
+    """
+    Runs a converted .tflite model with one reused interpreter.
+    - predict() mirrors keras Model.predict, so the rest of the app can use it
+      in place of the Keras model.
+    - Tensors are only reallocated when the batch size changes.
+    - Quantized (int8) inputs and outputs are converted transparently.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"TFLite model file not found: {model_path}")
+        self.model_path = model_path
+        self._interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter is not thread-safe; every call goes through this lock
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size == self._batch_size:
+            return
+        self._interpreter.resize_tensor_input(self._input['index'], (batch_size,) + INPUT_SHAPE)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def _quantize_input(self, batch):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, output):
+        if self._output['dtype'] == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        batch = np.asarray(batch)
+        with self._lock:
+            self._resize(len(batch))
+            self._interpreter.set_tensor(self._input['index'], self._quantize_input(batch))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output['index'])
+        return self._dequantize_output(output)
+
+    def model_bytes(self):
+        return os.path.getsize(self.model_path)
+
+
+# Function to find images under a directory, with the parent folder name as label
+def find_images(image_dir, limit=None):
+    found = []
+    for root, _, files in os.walk(image_dir):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append((os.path.join(root, name), os.path.basename(root)))
+                if limit and len(found) >= limit:
+                    return found
+    return found
+
+
+# Function to build a preprocessed calibration set from sample images
+def build_calibration_set(image_dir, limit=100):
+    from classification_page import preprocess_image
+
+    images = find_images(image_dir, limit)
+    if not images:
+        raise FileNotFoundError(f"No calibration images found in: {image_dir}")
+    return np.concatenate([preprocess_image(path) for path, _ in images])
+
+
+# Function to convert the Keras model into float16 and int8 TFLite models
+def convert(calibration, model_path=MODEL_PATH, output_paths=TFLITE_MODEL_PATHS):
+    import tensorflow as tf
+    from classification_page import load_model_func
+
+    model = load_model_func(model_path)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    with open(output_paths['tflite-fp16'], 'wb') as file:
+        file.write(converter.convert())
+
+    def representative_dataset():
+        for image in calibration:
+            yield [image[np.newaxis].astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    with open(output_paths['tflite-int8'], 'wb') as file:
+        file.write(converter.convert())
+    return model
+
+
+# Function to time single-image inference (mean milliseconds)
+def single_image_latency_ms(model, images, runs=50):
+    model.predict(images[:1], verbose=0)
+    start = time.perf_counter()
+    for i in range(runs):
+        model.predict(images[i % len(images)][np.newaxis], verbose=0)
+    return (time.perf_counter() - start) / runs * 1000.0
+
+
+# Function to measure the memory a backend adds to a fresh process
+def measure_memory(backend):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), 'memory', backend],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Function to compare every backend against Keras on an evaluation set
+def compare_backends(eval_dir, labels, backends=('keras', 'keras-compiled') + tuple(TFLITE_MODEL_PATHS)):
+    from classification_page import preprocess_image
+
+    samples = find_images(eval_dir)
+    images = np.concatenate([preprocess_image(path) for path, _ in samples])
+    truth = [folder for _, folder in samples]
+    labelled = all(label in labels for label in truth)
+
+    report = {}
+    reference = None
+    for backend in backends:
+        model = load_backend(backend)
+        predicted = np.argmax(model.predict(images, verbose=0), axis=1)
+        if reference is None:
+            reference = predicted
+        row = {
+            'agreement_with_keras': float(np.mean(predicted == reference)),
+            'latency_ms': single_image_latency_ms(model, images),
+            'memory': measure_memory(backend),
+        }
+        if labelled:
+            row['accuracy'] = float(np.mean([labels[p] == t for p, t in zip(predicted, truth)]))
+        report[backend] = row
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert waste_classification.h5 to TFLite and compare backends.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help="Write float16 and int8 TFLite models and report the change")
+    convert_parser.add_argument('--calibration-dir', required=True,
+                                help="Sample images used to calibrate int8 quantization")
+    convert_parser.add_argument('--eval-dir',
+                                help="Images to compare on; label/<image> layout also reports accuracy "
+                                     "(defaults to the calibration images)")
+    convert_parser.add_argument('--calibration-size', type=int, default=100)
+    memory_parser = commands.add_parser('memory', help=argparse.SUPPRESS)
+    memory_parser.add_argument('backend')
+    args = parser.parse_args()
+
+    if args.command == 'memory':
+        # Runs in a fresh process: report how much loading and one prediction cost
+        rss_before = current_rss_bytes()
+        model = load_backend(args.backend)
+        model.predict(np.zeros((1,) + INPUT_SHAPE, dtype=np.float32), verbose=0)
+        model_path = getattr(model, 'model_path', MODEL_PATH)
+        print(json.dumps({
+            'rss_increase_bytes': current_rss_bytes() - rss_before,
+            'file_bytes': os.path.getsize(model_path),
+        }))
+        return
+
+    from classification_page import load_labels
+
+    calibration = build_calibration_set(args.calibration_dir, args.calibration_size)
+    convert(calibration)
+    report = compare_backends(args.eval_dir or args.calibration_dir, load_labels())
+    for backend, row in report.items():
+        accuracy = f"{row['accuracy']:.3f}" if 'accuracy' in row else "-"
+        print(f"{backend:<12} agreement {row['agreement_with_keras']:.3f}  accuracy {accuracy}  "
+              f"latency {row['latency_ms']:.1f} ms  file {row['memory']['file_bytes'] / 2**20:.1f} MiB  "
+              f"memory +{row['memory']['rss_increase_bytes'] / 2**20:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
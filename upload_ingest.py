@@ -0,0 +1,216 @@
+import argparse
+import io
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import diagnostics
+from model_holder import current_rss_bytes
+from preprocessing import DISPLAY_MAX_SIDE, TARGET_SIZE, synthetic_jpeg
+
+# Keep in step with server.maxUploadSize in .streamlit/config.toml (MiB)
+MAX_UPLOAD_BYTES = int(os.environ.get("ECOSORT_MAX_UPLOAD_BYTES", str(25 * 2**20)))
+# Hard limit on the pixel count declared in the header; larger files are never decoded
+MAX_SOURCE_PIXELS = int(os.environ.get("ECOSORT_MAX_SOURCE_PIXELS", str(64_000_000)))
+# Limit on the pixels actually decoded: JPEG shrinks during decode, PNG cannot
+MAX_DECODED_PIXELS = int(os.environ.get("ECOSORT_MAX_DECODED_PIXELS", str(16_000_000)))
+ALLOWED_FORMATS = ('JPEG', 'PNG')
+# Burst-test limit on peak RSS growth for bounded ingestion, whatever the upload count or concurrency
+MAX_BURST_PEAK_BYTES = 256 * 2**20
+
+
+class UploadRejected(ValueError):
+    """
+    Raised for uploads that are too large or not a supported image.
+    """
+
+
+# Function to read the image header and reject uploads before any pixel is decoded
+def check_upload(source, max_side=None):
+    """
+    Open `source` lazily and return the PIL image, with JPEG draft mode already
+    set so that decoding produces about `max_side` per side (default: the
+    model input size).
+    Raises UploadRejected for unsupported formats or oversized files.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    size = getattr(source, 'size', None)
+    if size is None and hasattr(source, 'getbuffer'):
+        size = source.getbuffer().nbytes
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise UploadRejected(f"file is {size / 2**20:.1f} MiB; the limit is {MAX_UPLOAD_BYTES / 2**20:.0f} MiB")
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    try:
+        img = Image.open(source)  # Reads the header only
+    except (OSError, Image.DecompressionBombError) as e:
+        raise UploadRejected(f"not a readable image: {e}")
+    if img.format not in ALLOWED_FORMATS:
+        raise UploadRejected(f"unsupported image format: {img.format}")
+    width, height = img.size
+    if width * height > MAX_SOURCE_PIXELS:
+        raise UploadRejected(f"image is {width * height / 1e6:.0f} MP; the limit is {MAX_SOURCE_PIXELS / 1e6:.0f} MP")
+    side = max_side or max(TARGET_SIZE)
+    img.draft('RGB', (side, side))
+    width, height = img.size  # The size that will actually be decoded
+    if width * height > MAX_DECODED_PIXELS:
+        raise UploadRejected(f"{img.format} images are limited to {MAX_DECODED_PIXELS / 1e6:.0f} MP "
+                             f"(this one is {width * height / 1e6:.0f} MP)")
+    return img
+
+
+# Function to decode an upload with bounded memory, downscaled for display and the model
+def ingest_upload(source, max_side=None):
+    """
+    Check, decode and downscale an upload in one pass and return an RGB image,
+    no larger than `max_side` when given (same sizing as decode_image, so
+    model inputs are unchanged). The full-resolution pixels never exist for
+    JPEGs, and nothing keeps a reference to the encoded upload afterwards.
+    Records the decoded bytes (the request's pixel-buffer peak) in diagnostics.
+    """
+    img = check_upload(source, max_side)
+    width, height = img.size
+    with diagnostics.stage('decode'):
+        img.load()
+        if max_side and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.BILINEAR)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+    diagnostics.record_peak('upload_decoded_bytes', width * height * len(img.getbands()))
+    return img
+
+
+# Function to encode a photo-like JPEG of any size without building it at full size in numpy
+def large_jpeg(width, height, seed=0):
+    tile = Image.open(io.BytesIO(synthetic_jpeg(640, 480, seed)))
+    encoded = io.BytesIO()
+    tile.resize((width, height), Image.BILINEAR).save(encoded, format='JPEG', quality=85)
+    return encoded.getvalue()
+
+
+# Function to build a PNG that is only a header declaring width x height (a decompression bomb's header)
+def png_header_only(width, height):
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IEND', b''))
+
+
+# Function to check that every kind of oversized upload is rejected before decoding; returns failures
+def check_rejections():
+    gif = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(gif, format='GIF')
+    cases = [
+        ('file over the byte limit', b'\xff\xd8' + bytes(MAX_UPLOAD_BYTES)),
+        ('PNG bomb header (400 MP)', png_header_only(20_000, 20_000)),
+        ('PNG over the decoded-pixel limit', png_header_only(5_000, 4_000)),
+        ('JPEG over the source-pixel limit', large_jpeg(10_000, 7_000)),
+        ('unsupported format (GIF)', gif.getvalue()),
+        ('not an image', b'not an image'),
+    ]
+    failures = []
+    for name, data in cases:
+        try:
+            ingest_upload(data)
+        except UploadRejected:
+            print(f"rejected  {name}")
+            continue
+        except Exception as e:
+            failures.append(f"{name}: raised {type(e).__name__} instead of UploadRejected")
+        else:
+            failures.append(f"{name}: was accepted")
+        print(f"FAILED    {name}")
+    return failures
+
+
+# Function to decode the way uploads were handled before: full size, twice
+def _legacy_ingest(image_bytes):
+    img = Image.open(io.BytesIO(image_bytes))
+    img.load()
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    return img.resize(TARGET_SIZE, Image.NEAREST)
+
+
+# Function run in a fresh interpreter: decode a burst of uploads and report RSS
+def _burst_worker(mode, uploads, concurrency, rounds):
+    image_bytes = large_jpeg(8660, 5773)  # About 50 MP
+    if mode == 'legacy':
+        decode = _legacy_ingest
+    else:
+        decode = lambda data: ingest_upload(data, max_side=DISPLAY_MAX_SIDE)
+    baseline = current_rss_bytes()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], current_rss_bytes())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    after_round = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(rounds):
+            # Each upload is its own buffer, as it would be for separate users
+            list(pool.map(decode, [bytes(image_bytes) for _ in range(uploads)]))
+            after_round.append(current_rss_bytes())
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    mib = 2**20
+    print(f"{mode:<8} {rounds} x {uploads} uploads of 50 MP ({concurrency} at once) in {elapsed:.1f} s: "
+          f"peak RSS +{(peak[0] - baseline) / mib:.0f} MiB, after each round "
+          f"{', '.join(f'+{(rss - baseline) / mib:.0f}' for rss in after_round)} MiB")
+    return peak[0] - baseline
+
+
+# Function to compare peak memory of the old and bounded ingestion under a burst of large uploads
+def burst_test(uploads=8, concurrency=4, rounds=3, max_peak_bytes=MAX_BURST_PEAK_BYTES):
+    """
+    Each mode runs in its own interpreter so the RSS numbers do not mix.
+    The legacy run is for comparison only. The bounded run fails when its
+    peak RSS growth exceeds `max_peak_bytes`, which does not scale with the
+    number of uploads or the concurrency. Oversized and bomb uploads must
+    raise UploadRejected. Returns the list of failed checks.
+    """
+    failures = check_rejections()
+    for mode in ('legacy', 'bounded'):
+        result = subprocess.run([sys.executable, __file__, '--worker', mode, '--uploads', str(uploads),
+                                 '--concurrency', str(concurrency), '--rounds', str(rounds),
+                                 '--max-peak-mib', str(max_peak_bytes // 2**20)])
+        if mode == 'bounded' and result.returncode:
+            failures.append(f"bounded ingestion peak RSS over {max_peak_bytes // 2**20} MiB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst-test upload ingestion memory with 50-megapixel JPEGs "
+                                                 "and check that oversized uploads are rejected.")
+    parser.add_argument('--uploads', type=int, default=8, help="Uploads per round")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--max-peak-mib', type=int, default=MAX_BURST_PEAK_BYTES // 2**20,
+                        help="Fail when bounded ingestion's peak RSS grows by more than this")
+    parser.add_argument('--worker', choices=('legacy', 'bounded'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        peak = _burst_worker(args.worker, args.uploads, args.concurrency, args.rounds)
+        sys.exit(1 if args.worker == 'bounded' and peak > args.max_peak_mib * 2**20 else 0)
+    failures = burst_test(args.uploads, args.concurrency, args.rounds, args.max_peak_mib * 2**20)
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
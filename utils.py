@@ -1,7 +1,6 @@
 from tensorflow.keras.models import load_model
-import numpy as np
-from tensorflow.keras.preprocessing.image import img_to_array
 from PIL import Image
+from preprocessing import to_model_input
 
 def preprocess(image):
     """
@@ -10,18 +9,11 @@ def preprocess(image):
     - Resize to the expected input size of the model.
     - Convert the image to a numpy array.
     - Normalize pixel values (if required).
+    Uses the shared step in preprocessing.py with this model's /255
+    normalization and bicubic resize.
     """
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    target_size = (224, 224)  # Match the size of the Teachable Machine model
-    image = image.resize(target_size)
-    
-    image = img_to_array(image)
-    image = np.expand_dims(image, axis=0)
-    image = image / 255.0  # Normalize the pixel values
-    
-    return image
+    # Resized to 224x224 to match the Teachable Machine model
+    return to_model_input(image, normalization='unit', resample=Image.BICUBIC)
 
 def model_arc():
     """
@@ -0,0 +1,276 @@
+import argparse
+import collections
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from cascade import to_probabilities
+from model_holder import INPUT_SHAPE
+from preprocessing import normalize_batch
+
+DEFAULT_MAX_BATCH = 8
+DEFAULT_WINDOW = 8
+# Frames kept waiting for inference; older ones are skipped when inference falls behind
+MAX_BUFFERED_FRAMES = 2 * DEFAULT_MAX_BATCH
+BUNDLED_IMAGES = ('kashish.jpg', 'tejas.jpg', 'vidhi.jpg')
+# Camera indices the web page may open, e.g. "0,1" (empty: uploaded videos only).
+# Other sources (files, URLs) are only accepted by the command line.
+STREAM_CAMERAS = [int(index) for index in os.environ.get("ECOSORT_STREAM_CAMERAS", "").split(',') if index.strip()]
+MAX_PAGE_STREAM_SECONDS = 60  # The page's script thread is busy for the whole run
+VIDEO_TYPES = ["mp4", "avi", "mov", "mkv", "webm"]
+
+
+class FrameReader:
+    """
+    Reads frames from a video file or capture device on a background thread.
+    - Keeps at most `max_buffered` frames; when inference falls behind the
+      oldest frames are dropped, so the stream never lags further and further.
+    - `realtime=True` paces a video file at its own frame rate, like a camera.
+    """
+
+    def __init__(self, source, realtime=False, max_buffered=MAX_BUFFERED_FRAMES):
+        self.capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+        if not self.capture.isOpened():
+            raise ValueError(f"Cannot open video source: {source}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime
+        self._frames = collections.deque(maxlen=max_buffered)
+        self._ready = threading.Condition()
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.finished = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        while not self._stopped:
+            ok, frame = self.capture.read()
+            if not ok:
+                break
+            if self.realtime:
+                delay = start + self.frames_read / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            with self._ready:
+                if len(self._frames) == self._frames.maxlen:
+                    self.frames_dropped += 1
+                self._frames.append((self.frames_read, time.perf_counter(), frame))
+                self.frames_read += 1
+                self._ready.notify()
+        self.capture.release()
+        with self._ready:
+            self.finished = True
+            self._ready.notify()
+
+    def take(self, timeout=1.0):
+        """
+        Return every buffered (index, captured_at, frame), waiting for at least one.
+        """
+        with self._ready:
+            if not self._frames and not self.finished:
+                self._ready.wait(timeout)
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+    def stop(self):
+        self._stopped = True
+        self._thread.join()
+
+
+class TemporalSmoother:
+    """
+    Averages class probabilities over the last `window` classified frames,
+    so one bad frame does not flip the label shown at the belt.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._probabilities = collections.deque(maxlen=window)
+
+    def update(self, probabilities):
+        self._probabilities.append(probabilities)
+        mean = np.mean(self._probabilities, axis=0)
+        best = int(np.argmax(mean))
+        return best, float(mean[best])
+
+
+# Function to pick at most `max_batch` frames, evenly spread and always including the newest
+def sample_frames(frames, max_batch):
+    if len(frames) <= max_batch:
+        return frames, 0
+    keep = np.linspace(len(frames) - 1, 0, max_batch).round().astype(int)[::-1]
+    return [frames[i] for i in keep], len(frames) - max_batch
+
+
+# Function to turn BGR frames into one normalized model batch
+def frames_to_batch(frames):
+    batch = np.empty((len(frames),) + INPUT_SHAPE, dtype=np.uint8)
+    for row, frame in enumerate(frames):
+        small = cv2.resize(frame, INPUT_SHAPE[1::-1], interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=batch[row])
+    return normalize_batch(batch)
+
+
+# Function to run the shared model on one batch
+def _predict_with_shared_model(batch):
+    from model_holder import get_model_holder
+
+    model, _ = get_model_holder().get()
+    return model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+# Function to classify a video stream, returning throughput and lag figures
+def run_stream(source, labels, predict_fn=_predict_with_shared_model, realtime=False,
+               max_batch=DEFAULT_MAX_BATCH, window=DEFAULT_WINDOW, max_seconds=None, on_result=None):
+    """
+    Classify `source` continuously: read frames on a background thread,
+    sample as many as inference can keep up with, run each sample as one
+    batch and smooth the labels over a sliding window.
+    `on_result` is called with a dict per classified frame.
+    """
+    reader = FrameReader(source, realtime=realtime)
+    smoother = TemporalSmoother(window)
+    lags, batch_sizes = [], collections.Counter()
+    classified = sampled_out = 0
+    start = time.perf_counter()
+    try:
+        while max_seconds is None or time.perf_counter() - start < max_seconds:
+            frames = reader.take()
+            if not frames:
+                if reader.finished:
+                    break
+                continue
+            frames, skipped = sample_frames(frames, max_batch)
+            sampled_out += skipped
+            probabilities = to_probabilities(predict_fn(frames_to_batch([frame for _, _, frame in frames])))
+            done = time.perf_counter()
+            batch_sizes[len(frames)] += 1
+            for (index, captured_at, _), row in zip(frames, probabilities):
+                best, confidence = smoother.update(row)
+                lags.append(done - captured_at)
+                classified += 1
+                if on_result is not None:
+                    on_result({'frame': index, 'label': labels[int(np.argmax(row))],
+                               'smoothed_label': labels[best], 'confidence': confidence, 'lag': done - captured_at})
+    finally:
+        reader.stop()
+    elapsed = time.perf_counter() - start
+    lags = np.array(lags) * 1000.0 if lags else np.zeros(1)
+    return {
+        'seconds': elapsed,
+        'frames_read': reader.frames_read,
+        'frames_classified': classified,
+        'frames_skipped': sampled_out + reader.frames_dropped,
+        'source_fps': reader.frames_read / elapsed,
+        'classified_fps': classified / elapsed,
+        'lag_ms_p50': float(np.percentile(lags, 50)),
+        'lag_ms_p95': float(np.percentile(lags, 95)),
+        'batch_sizes': dict(sorted(batch_sizes.items())),
+    }
+
+
+# Function to write a synthetic conveyor-belt video: the bundled photos sliding across the frame
+def write_synthetic_video(path, seconds=10, fps=30, size=(640, 480)):
+    width, height = size
+    items = [cv2.resize(cv2.imread(name), (height // 2, height // 2)) for name in BUNDLED_IMAGES]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    frames_per_item = 2 * fps
+    for index in range(int(seconds * fps)):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)  # The belt
+        item = items[(index // frames_per_item) % len(items)]
+        x = int((index % frames_per_item) / frames_per_item * (width + item.shape[1])) - item.shape[1]
+        left, right = max(x, 0), min(x + item.shape[1], width)
+        if right > left:
+            top = (height - item.shape[0]) // 2
+            frame[top:top + item.shape[0], left:right] = item[:, left - x:right - x]
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+# Function to show the live stream section of the classification page
+def show_stream_section(labels):
+    """
+    Visitors can only classify an uploaded video or one of the STREAM_CAMERAS;
+    the page never opens a path or URL they typed.
+    """
+    st.write("### Classify a Live Stream")
+    sources = ["Uploaded video"] + [f"Camera {index}" for index in STREAM_CAMERAS]
+    choice = st.selectbox("Source", sources, key="streamSource")
+    uploaded_video = None
+    if choice == "Uploaded video":
+        uploaded_video = st.file_uploader("Choose a video...", type=VIDEO_TYPES, key="streamVideoUploader")
+        if uploaded_video is None:
+            return
+    seconds = st.number_input("Run for (seconds)", min_value=5, max_value=MAX_PAGE_STREAM_SECONDS, value=30)
+    if not st.button("Start Stream", key="startStreamButton"):
+        return
+    if uploaded_video is None:
+        _show_stream(STREAM_CAMERAS[sources.index(choice) - 1], labels, seconds, realtime=False)
+        return
+    # OpenCV reads from a path; the file name is ours, never the visitor's
+    suffix = os.path.splitext(uploaded_video.name)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix if suffix[1:] in VIDEO_TYPES else '.mp4') as file:
+        file.write(uploaded_video.getbuffer())
+        file.flush()
+        _show_stream(file.name, labels, seconds, realtime=True)
+
+
+# Function to run a stream and show its label as it goes
+def _show_stream(source, labels, seconds, realtime):
+    label_box, stats_box = st.empty(), st.empty()
+    last_update = [0.0]
+
+    def show(result):
+        # Updating the page is far slower than inference; refresh a few times a second
+        now = time.perf_counter()
+        if now - last_update[0] > 0.2:
+            last_update[0] = now
+            label_box.markdown(f"### Now: **{result['smoothed_label']}** ({result['confidence']:.0%})")
+            stats_box.caption(f"frame {result['frame']}, lag {result['lag'] * 1000:.0f} ms")
+
+    try:
+        stats = run_stream(source, labels, realtime=realtime, max_seconds=seconds, on_result=show)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    st.success(f"{stats['classified_fps']:.1f} frames/s classified of {stats['source_fps']:.1f} read, "
+               f"lag p50 {stats['lag_ms_p50']:.0f} ms / p95 {stats['lag_ms_p95']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a video file or camera stream continuously.")
+    parser.add_argument('--source', help="Camera index or video file (default: a synthetic video)")
+    parser.add_argument('--realtime', action='store_true', help="Pace video files at their frame rate")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Length of the synthetic video")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW)
+    args = parser.parse_args()
+
+    from model_holder import get_model_holder
+
+    _, labels = get_model_holder().get()
+    source = args.source
+    if source is None:
+        source = write_synthetic_video('synthetic_belt.avi', seconds=args.seconds)
+        args.realtime = True
+    try:
+        stats = run_stream(source, labels, realtime=args.realtime, max_batch=args.max_batch, window=args.window)
+    finally:
+        if args.source is None:
+            os.remove(source)
+    print(f"read {stats['frames_read']} frames at {stats['source_fps']:.1f} fps, classified "
+          f"{stats['frames_classified']} at {stats['classified_fps']:.1f} fps ({stats['frames_skipped']} skipped)")
+    print(f"end-to-end lag p50 {stats['lag_ms_p50']:.1f} ms, p95 {stats['lag_ms_p95']:.1f} ms; "
+          f"batch sizes {stats['batch_sizes']}")
+
+
+if __name__ == "__main__":
+    main()